@@ -1,7 +1,10 @@
 import streamlit as st
 import time
+import json
 import requests
 import re
+import tempfile
+import pandas as pd
 from streamlit_lottie import st_lottie
 
 # API Configuration
@@ -13,6 +16,72 @@ class UserObj:
         self.id = data['id']
         self.full_name = data['full_name']
         self.email = data['email']
+        self.token = data.get('access_token')
+
+def auth_headers(user=None):
+    """Bearer header for the signed-in user (the API derives the caller from this token)."""
+    user = user or st.session_state.user
+    return {"Authorization": f"Bearer {user.token}"}
+
+HISTORY_PAGE_SIZE = 30
+
+def fetch_history_page(user=None, before=None, timeout=3):
+    """One page of chat history: (messages oldest-first, cursor for the next older page or None)."""
+    params = {"limit": HISTORY_PAGE_SIZE}
+    if before:
+        params["before"] = before
+    resp = requests.get(f"{API_URL}/auth/history", params=params, headers=auth_headers(user), timeout=timeout)
+    resp.raise_for_status()
+    page = resp.json()
+    messages = [{"role": h['role'], "content": h['content']} for h in page["messages"]]
+    return messages, page.get("next_cursor")
+
+# Rows of a result table kept in the saved chat message (the live view shows the full table)
+SAVED_TABLE_ROWS = 20
+
+def result_frame(result):
+    """DataFrame from the API's columnar result (columns, dtypes, one array per column)."""
+    df = pd.DataFrame(list(zip(*result["data"])), columns=result["columns"])
+    for column, dtype in zip(result["columns"], result["dtypes"]):
+        if dtype in ("date", "datetime"):
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
+
+def export_result(result_id, key):
+    """Downloads the full result from /agent/export (streamed to a temp file) and offers it for download."""
+    try:
+        with requests.post(f"{API_URL}/agent/export", json={"result_id": result_id, "format": "csv"},
+                           headers=auth_headers(), stream=True, timeout=300) as resp:
+            if resp.status_code != 200:
+                st.error(resp.json().get("detail", "Export failed"))
+                return
+            export_file = tempfile.TemporaryFile()
+            for chunk in resp.iter_content(chunk_size=1 << 16):
+                export_file.write(chunk)
+        export_file.seek(0)
+        st.download_button("Download CSV", data=export_file, file_name=f"nexora_export_{result_id[:8]}.csv",
+                           mime="text/csv", key=f"download_{key}")
+    except Exception as e:
+        st.error(f"Export failed: {e}")
+
+def render_result(result, key):
+    """`key` must be unique per chat message (the same result_id can appear twice via the answer cache)."""
+    st.dataframe(result_frame(result), use_container_width=True, hide_index=True)
+    if result.get("truncated"):
+        st.caption(f"Showing the first {len(result['data'][0]) if result['data'] else 0:,} of {result['row_count']:,} rows")
+        if result.get("result_id") and st.button("Export all rows (CSV)", key=f"export_{key}"):
+            export_result(result["result_id"], key)
+    with st.expander("SQL"):
+        st.code(result["sql"], language="sql")
+
+def result_markdown(result, max_rows=SAVED_TABLE_ROWS):
+    """Markdown copy of the first rows, saved with the message so history still shows the data."""
+    rows = list(zip(*result["data"]))[:max_rows]
+    lines = ["| " + " | ".join(result["columns"]) + " |", "|" + "|".join("---" for _ in result["columns"]) + "|"]
+    lines += ["| " + " | ".join("" if v is None else str(v) for v in row) + " |" for row in rows]
+    if result["row_count"] > len(rows):
+        lines.append(f"\n*{len(rows)} of {result['row_count']:,} rows shown.*")
+    return "\n".join(lines)
 
 # --- 1. SETUP & CONFIG ---
 
@@ -129,6 +198,7 @@ if 'auth_state' not in st.session_state: st.session_state.auth_state = 'idle'
 if 'auth_creds' not in st.session_state: st.session_state.auth_creds = {}
 if 'auth_error' not in st.session_state: st.session_state.auth_error = None
 if 'suggestions_clicked' not in st.session_state: st.session_state.suggestions_clicked = None
+if 'history_cursor' not in st.session_state: st.session_state.history_cursor = None
 
 # --- 5. UI COMPONENTS ---
 
@@ -213,14 +283,8 @@ def login_ui():
                          with st.spinner("Loading Dashboard..."):
                                 # 1. PREFETCH DATA (Ready Chatbot)
                                 try:
-                                    h_resp = requests.get(f"{API_URL}/auth/history/{u.id}", timeout=3)
-                                    if h_resp.status_code == 200:
-                                        st.session_state.messages = []
-                                        for h in h_resp.json():
-                                            st.session_state.messages.append({
-                                                "role": h['role'],
-                                                "content": h['content']
-                                            })
+                                    # Only the latest page; older messages load on demand in chat_ui
+                                    st.session_state.messages, st.session_state.history_cursor = fetch_history_page(u)
                                 except: pass
                                 time.sleep(1.0) # Ensure sync visual
 
@@ -355,10 +419,38 @@ def login_ui():
                                 st.session_state.auth_state = 'processing_signup'
                                 st.rerun()
 
-def stream_text(text):
-    for word in text.split(" "):
-        yield word + " "
-        time.sleep(0.015)
+def stream_agent(payload, status, response):
+    """
+    Yields answer tokens from the SSE endpoint as they arrive, reporting agent steps on `status`.
+    The result table of the last query the agent ran is left in response["result"].
+    """
+    with requests.post(f"{API_URL}/agent/chat/stream", json=payload, headers=auth_headers(), stream=True) as resp:
+        if resp.status_code == 429:
+            yield resp.json()["detail"]["message"]
+            return
+        if resp.status_code != 200:
+            yield "I'm having trouble connecting to the server."
+            return
+
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):])
+                if event == "token":
+                    yield data["text"]
+                elif event == "tool_start":
+                    status.update(label=f"Running `{data['tool']}`...")
+                    tool_input = data.get("input") or {}
+                    if isinstance(tool_input, dict) and tool_input.get("query"):
+                        status.code(tool_input["query"], language="sql")
+                elif event == "tool_end":
+                    status.caption(f"`{data['tool']}` returned {len(data.get('output', ''))} chars")
+                elif event == "result":
+                    response["result"] = data
+                elif event == "error":
+                    yield f"Error: {data['detail']}"
 
 def chat_ui():
     """Clean Native Streamlit Chat UI"""
@@ -439,6 +531,7 @@ def chat_ui():
         if st.button("🚪 Sign Out", use_container_width=True, type="primary"):
             st.session_state.user = None
             st.session_state.messages = []
+            st.session_state.history_cursor = None
             st.session_state.auth_state = "idle"
             st.rerun()
 
@@ -455,21 +548,24 @@ def chat_ui():
     # Load chat history once
     if not st.session_state.messages:
         try:
-            resp = requests.get(f"{API_URL}/auth/history/{st.session_state.user.id}")
-            if resp.status_code == 200:
-                history = resp.json()
-                for h in history:
-                    st.session_state.messages.append({
-                        "role": h['role'],
-                        "content": h['content']
-                    })
+            st.session_state.messages, st.session_state.history_cursor = fetch_history_page()
         except:
             pass
 
+    # Older messages are paged in on demand (keyset cursor from the last page)
+    if st.session_state.history_cursor:
+        if st.button("Load older messages", key="load_older"):
+            try:
+                older, st.session_state.history_cursor = fetch_history_page(before=st.session_state.history_cursor)
+                st.session_state.messages = older + st.session_state.messages
+            except Exception as e:
+                st.error(f"Could not load older messages: {e}")
+            st.rerun()
+
 
 
     # ---------- SHOW MESSAGES ----------
-    for msg in st.session_state.messages:
+    for index, msg in enumerate(st.session_state.messages):
         avatar = "👤" if msg["role"] == "user" else "✨"
         with st.chat_message(msg["role"], avatar=avatar):
             if msg["role"] == "user":
@@ -477,6 +573,8 @@ def chat_ui():
                 st.markdown(f"<span style='display:none;' class='is-user'></span>{msg['content']}", unsafe_allow_html=True)
             else:
                 st.markdown(msg["content"])
+                if msg.get("result"):
+                    render_result(msg["result"], key=index)
 
     # Logic for Sidebar Suggestions
     if 'suggestions_clicked' not in st.session_state:
@@ -508,54 +606,48 @@ def chat_ui():
         # AI response
         with st.chat_message("assistant", avatar="✨"):
             full_response = ""
+            response = {"result": None}
             
-            # 1. Show Spinner while waiting for API
-            with st.spinner("Nexora is analyzing your data..."):
-                # Save User Message (Hidden latency)
-                try:
-                     requests.post(f"{API_URL}/auth/message", json={
-                        "user_id": str(st.session_state.user.id),
-                        "role": "user",
-                        "content": prompt
-                     })
-                except: pass
-
-                try:
-                    # Message context
-                    ctx = [
-                        {"role": m["role"], "content": m["content"]}
-                        for m in st.session_state.messages[-5:]
-                    ]
-
-                    # Call Agent API
-                    payload = {
-                        "input": prompt,
-                        "user_id": str(st.session_state.user.id),
-                        "history": ctx
-                    }
-                    api_resp = requests.post(f"{API_URL}/agent/chat", json=payload)
-                    
-                    if api_resp.status_code == 200:
-                        full_response = api_resp.json()["output"]
-                    else:
-                        full_response = "I'm having trouble connecting to the server."
-
-                except Exception as e:
-                    full_response = f"Error: {e}"
-
-            # 2. Spinner is gone. Now Stream the text.
-            st.write_stream(stream_text(full_response))
+            # 1. Stream the answer straight from the agent (tokens + tool steps)
+            status = st.status("Nexora is analyzing your data...", expanded=False)
+            try:
+                # Message context (the API compacts it to its token budget)
+                ctx = [
+                    {"role": m["role"], "content": f"{m['content']}\n\n{result_markdown(m['result'])}" if m.get("result") else m["content"]}
+                    for m in st.session_state.messages[-10:]
+                ]
+
+                payload = {
+                    "input": prompt,
+                    "history": ctx
+                }
+                full_response = st.write_stream(stream_agent(payload, status, response))
+                if not isinstance(full_response, str):
+                    full_response = "".join(str(part) for part in full_response)
+
+                # The rows arrive as a columnar table; the model only writes the narrative
+                if response["result"]:
+                    render_result(response["result"], key=len(st.session_state.messages))
+
+            except Exception as e:
+                full_response = f"Error: {e}"
+                st.markdown(full_response)
+
+            # 2. Close the status box
+            status.update(label="Analysis complete", state="complete")
             
             # 3. Append to State (So it stays on rerun)
-            st.session_state.messages.append({"role": "assistant", "content": full_response})
+            st.session_state.messages.append({"role": "assistant", "content": full_response, "result": response["result"]})
             
-            # 4. Save to API
+            # 4. Save both turns to the API in one batch (with a markdown copy of the table)
+            saved_response = full_response
+            if response["result"]:
+                saved_response = f"{full_response}\n\n{result_markdown(response['result'])}"
             try:
-                requests.post(f"{API_URL}/auth/message", json={
-                    "user_id": str(st.session_state.user.id),
-                    "role": "assistant",
-                    "content": full_response
-                })
+                requests.post(f"{API_URL}/auth/messages", json={"messages": [
+                    {"role": "user", "content": prompt},
+                    {"role": "assistant", "content": saved_response}
+                ]}, headers=auth_headers())
             except: pass
 
             # Chat loop end
@@ -1,23 +1,76 @@
 import os
+import re
+import asyncio
 import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
 from datetime import datetime
 
 from langchain_openai import ChatOpenAI
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
 from langchain_community.agent_toolkits.sql.base import create_sql_agent
-from langchain_community.tools.sql_database.tool import QuerySQLDataBaseTool
+from langchain_community.tools.sql_database.tool import BaseSQLDatabaseTool, QuerySQLDataBaseTool
+from langchain.agents import AgentExecutor, create_openai_tools_agent
 
 from langchain_core.tools import BaseTool
+from sqlalchemy.exc import DBAPIError
 
 # Import db connection - verify this exists in backend/db.py
 from backend.db import get_db_connection
-from backend.prompts import SYSTEM_PREFIX
-from backend.guards import validate_sql
+from backend.prompts import AGENT_PROMPT, SINGLE_SHOT_PROMPT
+from backend.guards import validate_sql, check_identifiers, normalize_sql, referenced_tables, SQLGuardException
+from backend.cache import LRUCache
+from backend.query_runner import execute_guarded_query, dry_run, QueryRejected
+from backend.data_version import get_data_versions, get_schema_version
+from backend.schema_cache import compact_schema, get_schema_snapshot
+from backend import context_builder, tracing, result_table
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Shared across users: identical SQL against unchanged tables returns the cached result.
+# Keys include the data versions of the tables read (see backend/data_version.py),
+# so a write to `orders` makes its old entries unreachable; they then age out via LRU/TTL.
+# Values are (tool output, ResultTable).
+result_cache = LRUCache(
+    maxsize=int(os.getenv("NEXORA_RESULT_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("NEXORA_RESULT_CACHE_TTL", "300"))
+)
+
+# Blocking DB work from the async agent path runs here, not on Starlette's shared threadpool.
+# Sized to the engine pool (pool_size + max_overflow) so it can't queue on connections.
+db_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("NEXORA_DB_WORKERS", "15")),
+    thread_name_prefix="nexora-db"
+)
+
+async def run_blocking(func, *args):
+    """Runs a blocking (DB-bound) call on `db_executor`, in the caller's context (so tracing follows it)."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(db_executor, ctx.run, func, *args)
+
+# Final answers keyed on (normalized question, current date, nexora_sales version).
+# Values are ChatResponse fields: {"output": ..., "result": ResultTable dict or None}.
+answer_cache = LRUCache(
+    maxsize=int(os.getenv("NEXORA_ANSWER_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("NEXORA_ANSWER_CACHE_TTL", "3600"))
+)
+
+# "toolkit" (default): create_sql_agent with the full SQL toolkit.
+# "single_shot": schema in the prompt, only sql_db_query, bounded plan -> execute -> answer loop.
+AGENT_MODE = os.getenv("NEXORA_AGENT_MODE", "toolkit")
+# Single-shot budget: agent steps (LLM turns) and wall-clock seconds per question
+AGENT_MAX_ITERATIONS = int(os.getenv("NEXORA_AGENT_MAX_ITERATIONS", "4"))
+AGENT_MAX_SECONDS = float(os.getenv("NEXORA_AGENT_MAX_SECONDS", "45"))
+
+SINGLE_SHOT_TOOL_DESCRIPTION = (
+    "Execute a PostgreSQL SELECT against the nexora_sales tables described in the system prompt "
+    "and return the result. If an error is returned, fix the query and try again."
+)
+
 class SafeQuerySQLDataBaseTool(QuerySQLDataBaseTool):
     """
     Tool for querying a SQL database with mandatory safety checks.
@@ -27,15 +80,85 @@ class SafeQuerySQLDataBaseTool(QuerySQLDataBaseTool):
         try:
             # 1. Validate SQL
             validate_sql(query)
-            # 2. Execute if safe
-            return super()._run(query, run_manager)
+
+            # 2. Serve from the result cache if the tables it reads haven't changed
+            versions = get_data_versions()
+            if versions is not None:
+                stamp = tuple(versions.get(t) for t in referenced_tables(query))
+                key = (normalize_sql(query), stamp)
+                cached = result_cache.get(key)
+                tracing.record_cache("result", cached is not None)
+                if cached is not None:
+                    tracing.record_sql(query, 0.0, None, outcome="cached")
+                    result, table = cached
+                    result_table.capture(table)
+                    return result
+
+            # 3. Execute if safe (bounded: outer LIMIT, statement_timeout, EXPLAIN cost gate)
+            result, table = execute_guarded_query(self.db, query)
+
+            # 4. The client gets the rows as a table; the model only sees `result`
+            result_table.capture(table)
+            if versions is not None and not result.startswith("Error"):
+                result_cache.set(key, (result, table))
+            return result
+        except QueryRejected as e:
+            tracing.record_guard_rejection(query, str(e), kind="plan")
+            logger.error(f"SQL Tool Error: {e}")
+            return f"Error: {str(e)}"
+        except SQLGuardException as e:
+            tracing.record_guard_rejection(query, str(e))
+            logger.error(f"SQL Tool Error: {e}")
+            return f"Error: {str(e)}"
         except Exception as e:
+            tracing.record_sql(query, 0.0, None, outcome="error")
             logger.error(f"SQL Tool Error: {e}")
             return f"Error: {str(e)}"
 
+    async def _arun(self, query: str, run_manager=None) -> str:
+        """Async entry point used by `ainvoke`: the query runs on `db_executor`."""
+        return await run_blocking(self._run, query)
+
+class LocalQueryCheckerTool(BaseSQLDatabaseTool, BaseTool):
+    """
+    Drop-in for LangChain's `sql_db_query_checker` that checks locally instead of asking the LLM:
+    guards, identifiers against the cached catalog, then an EXPLAIN dry run.
+    """
+    name: str = "sql_db_query_checker"
+    description: str = (
+        "Use this tool to double check if your query is correct before executing it. "
+        "It validates the SQL, checks table and column names, and plans it without running it. "
+        "Always use this tool before executing a query with sql_db_query!"
+    )
+
+    def _run(self, query: str, run_manager=None) -> str:
+        try:
+            # 1. Read-only / allowlist guards
+            validate_sql(query)
+
+            # 2. Table and column names against the cached catalog
+            check_identifiers(query, get_schema_snapshot(self.db).columns)
+
+            # 3. Dry run: the database plans the query without executing it
+            dry_run(self.db, query)
+        except QueryRejected as e:
+            tracing.record_guard_rejection(query, str(e), kind="plan")
+            return f"Error: {str(e)}"
+        except SQLGuardException as e:
+            tracing.record_guard_rejection(query, str(e), kind="checker")
+            return f"Error: {str(e)}"
+        except DBAPIError as e:
+            # The driver's first line is the precise message (e.g. column "x" does not exist)
+            detail = str(e.orig).strip().splitlines()[0] if e.orig is not None else str(e)
+            return f"Error: {detail}"
+        return f"The query is valid. Run it with sql_db_query:\n{query}"
+
+    async def _arun(self, query: str, run_manager=None) -> str:
+        return await run_blocking(self._run, query)
+
 class SafeSQLDatabaseToolkit(SQLDatabaseToolkit):
     """
-    Custom toolkit that provides the SafeQuerySQLDataBaseTool.
+    Custom toolkit that provides the SafeQuerySQLDataBaseTool and the local query checker.
     """
     def get_tools(self) -> List[BaseTool]:
         """Get the tools in the toolkit."""
@@ -49,16 +172,78 @@ class SafeSQLDatabaseToolkit(SQLDatabaseToolkit):
                     description=tool.description
                 )
                 safe_tools.append(safe_tool)
+            elif tool.name == "sql_db_query_checker":
+                # Checked locally: no extra LLM round-trip per query
+                safe_tools.append(LocalQueryCheckerTool(db=self.db, description=tool.description))
             else:
                 safe_tools.append(tool)
         return safe_tools
 
-def get_agent_executor(chat_history: list = None):
+_agent_executor = None
+_agent_lock = threading.Lock()
+
+def current_date() -> str:
+    return datetime.now().strftime("%Y-%m-%d")
+
+def normalize_question(question: str) -> str:
+    """Lower-cases, collapses whitespace and drops trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().rstrip("?!. ").lower()
+
+def answer_cache_key(question: str, history: list = None):
     """
-    Constructs and returns the SQL Agent Executor.
+    Cache key for a final answer, or None when the answer cache must be bypassed:
+    the data version is unknown, or the question comes with chat history (a follow-up
+    like "and for Pune?" depends on the conversation, and the cache is shared).
+    """
+    if history:
+        return None
+    version = get_schema_version()
+    if version is None:
+        return None
+    return (normalize_question(question), current_date(), version)
+
+def build_chat_context(chat_history: list = None) -> str:
+    """
+    Builds the per-request part of the system prompt (current date + recent history),
+    kept within NEXORA_CONTEXT_TOKEN_BUDGET tokens (see backend/context_builder.py).
     Args:
         chat_history: List of (role, content) tuples or dictionaries.
     """
+    return context_builder.build_chat_context(chat_history, today=current_date())
+
+def build_agent_inputs(question: str, chat_history: list = None) -> dict:
+    """
+    The per-request inputs for the agent executor. Blocking (the schema snapshot may
+    re-read the catalog), so async callers run it with run_blocking before invoking.
+    """
+    inputs = {"input": question, "context": build_chat_context(chat_history)}
+    if AGENT_MODE == "single_shot":
+        inputs["schema"] = compact_schema(get_db_connection())
+    return inputs
+
+def _build_single_shot_executor(db, llm):
+    """
+    Agent with only the guarded query tool and the compact schema in its prompt
+    (the `schema` input from build_agent_inputs, so catalog changes are picked up).
+    Stops after AGENT_MAX_ITERATIONS steps or AGENT_MAX_SECONDS, whichever comes first.
+    """
+    tools = [SafeQuerySQLDataBaseTool(db=db, description=SINGLE_SHOT_TOOL_DESCRIPTION)]
+    prompt = SINGLE_SHOT_PROMPT
+    return AgentExecutor(
+        name="SQL Agent Executor",
+        agent=create_openai_tools_agent(llm, tools, prompt),
+        tools=tools,
+        verbose=True,
+        max_iterations=AGENT_MAX_ITERATIONS,
+        max_execution_time=AGENT_MAX_SECONDS,
+        early_stopping_method="force",
+    )
+
+def _build_agent_executor():
+    """
+    Constructs the SQL Agent Executor (DB, LLM, toolkit, compiled prompt)
+    in the mode selected by NEXORA_AGENT_MODE.
+    """
     try:
         # 1. Setup DB
         db = get_db_connection()
@@ -66,35 +251,23 @@ def get_agent_executor(chat_history: list = None):
         # 2. Setup LLM
         llm = ChatOpenAI(
             model="gpt-4o", 
-            temperature=0
+            temperature=0,
+            stream_usage=True  # token usage on streamed calls too (see backend/tracing.py)
         )
         
+        if AGENT_MODE == "single_shot":
+            return _build_single_shot_executor(db, llm)
+
         # 3. Setup Toolkit with Safety
         toolkit = SafeSQLDatabaseToolkit(db=db, llm=llm)
         
-        # 4. Construct System Prompt with History
-        today = datetime.now().strftime("%Y-%m-%d")
-        date_context = f"\n\n**Current Date**: {today} (Use this for 'today', 'this month', or determining the current year)."
-    
-        prompt_suffix = date_context
-        if chat_history:
-            prompt_suffix += "\n\n**Recent Chat History**:\n"
-            for role, content in chat_history:
-                 # Handle dict or tuple inputs for robustness
-                 r = role if isinstance(role, str) else role.get('role', 'user')
-                 c = content if isinstance(content, str) else content.get('content', '')
-                 prompt_suffix += f"- {str(r).upper()}: {str(c)}\n"
-            prompt_suffix += "\nUse the above history to understand context (e.g., 'previous month', 'that product')."
-    
-        full_prefix = SYSTEM_PREFIX + prompt_suffix
-    
-        # 5. Create Agent
+        # 4. Create Agent (date/history are supplied per request via the `context` input)
         agent_executor = create_sql_agent(
             llm=llm,
             toolkit=toolkit,
             verbose=True,
             agent_type="openai-tools",
-            prefix=full_prefix
+            prompt=AGENT_PROMPT
         )
         
         return agent_executor
@@ -106,3 +279,15 @@ def get_agent_executor(chat_history: list = None):
         logger.critical(f"Failed to initialize agent: {e}")
         # In a real app we might return a dummy agent or re-raise
         raise RuntimeError(f"Failed to initialize AI agent: {e}")
+
+def get_agent_executor():
+    """
+    Returns the process-wide SQL Agent Executor, building it on first use.
+    Invoke it with build_agent_inputs(question, history).
+    """
+    global _agent_executor
+    if _agent_executor is None:
+        with _agent_lock:
+            if _agent_executor is None:
+                _agent_executor = _build_agent_executor()
+    return _agent_executor
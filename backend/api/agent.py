@@ -1,19 +1,210 @@
-from fastapi import APIRouter, HTTPException
-from backend.agent import get_agent_executor
-from backend.schemas import ChatRequest, ChatResponse
+import json
+import logging
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.background import BackgroundTask
+from backend.agent import get_agent_executor, build_agent_inputs, answer_cache, answer_cache_key, result_cache, run_blocking
+from backend.limits import agent_limiter, AgentBusy
+from backend.schemas import ChatRequest, ChatResponse, ExportRequest
+from backend.guards import SQLGuardException
+from backend.export import ExportError
+from backend.auth.tokens import CurrentUser, get_current_user
+from backend.result_table import to_arrow_base64
+from backend import tracing, intent_router, sql_templates, result_table, export
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Tool outputs are echoed to the client only as a short preview
+TOOL_OUTPUT_PREVIEW_CHARS = 500
+
+def busy_detail(e: AgentBusy) -> dict:
+    return {"message": str(e), "queue_position": e.queue_position}
+
+def chat_payload(output: str, result: Optional[dict] = None, result_format: str = "json") -> dict:
+    """ChatResponse fields for an answer and the result table of its last query (if any)."""
+    if result is not None and result_format == "arrow":
+        result = {**result, "arrow": to_arrow_base64(result["columns"], result["data"])}
+    return {"output": output, "sql": result["sql"] if result else None, "result": result}
+
+def last_result(tables: list) -> Optional[dict]:
+    table = result_table.latest(tables)
+    return table.to_dict() if table is not None else None
 
 @router.post("/chat", response_model=ChatResponse)
-def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, current: CurrentUser = Depends(get_current_user)):
     try:
+        # Greetings, capability and out-of-domain messages are answered from templates
+        routed = intent_router.route(request.input, request.history)
+        if routed is not None:
+            tracing.record_intent(routed.intent)
+            return ChatResponse(output=routed.output)
+
+        # Repeated questions (same wording, same day, unchanged data) skip the agent entirely
+        cache_key = await run_blocking(answer_cache_key, request.input, request.history)
+        if cache_key is not None:
+            cached = answer_cache.get(cache_key)
+            tracing.record_cache("answer", cached is not None)
+            if cached is not None:
+                return ChatResponse(**chat_payload(cached["output"], cached["result"], request.result_format))
+
+        # Recurring question shapes run vetted SQL and a templated reply, no LLM call
+        templated = await run_blocking(sql_templates.answer, request.input)
+        if templated is not None:
+            tracing.record_template(templated.template)
+            result = templated.result.to_dict()
+            if cache_key is not None:
+                answer_cache.set(cache_key, {"output": templated.output, "result": result})
+            return ChatResponse(**chat_payload(templated.output, result, request.result_format))
+
         # Convert Pydantic models to dict/tuple format expected by agent
         history_tuples = [(msg['role'], msg['content']) for msg in request.history]
         
-        agent = get_agent_executor(chat_history=history_tuples)
-        response = agent.invoke({"input": request.input})
-        return ChatResponse(output=response["output"])
+        async with agent_limiter.slot(current.user_id):
+            agent = get_agent_executor()
+            inputs = await run_blocking(build_agent_inputs, request.input, history_tuples)
+            tables = result_table.start_capture()
+            response = await agent.ainvoke(inputs, config={"callbacks": tracing.agent_callbacks()})
+        result = last_result(tables)
+        if cache_key is not None:
+            answer_cache.set(cache_key, {"output": response["output"], "result": result})
+        return ChatResponse(**chat_payload(response["output"], result, request.result_format))
+    except AgentBusy as e:
+        raise HTTPException(status_code=429, detail=busy_detail(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Agent run failed")
         raise HTTPException(status_code=500, detail=str(e))
+
+def sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _agent_event_stream(request: ChatRequest, cache_key):
+    """
+    Runs the agent and yields SSE events as they happen:
+    `tool_start` (tool + input, e.g. the SQL issued), `tool_end` (output preview),
+    `result` (the query's rows as a columnar ResultTable, after each sql_db_query),
+    `token` (answer tokens), then `done` with the full answer, or `error`.
+    The caller holds an `agent_limiter` slot for the duration of the stream.
+    """
+    try:
+        history_tuples = [(msg['role'], msg['content']) for msg in request.history]
+        agent = get_agent_executor()
+        inputs = await run_blocking(build_agent_inputs, request.input, history_tuples)
+
+        output = None
+        tables = result_table.start_capture()
+        sent = 0
+        async for event in agent.astream_events(inputs, config={"callbacks": tracing.agent_callbacks()}, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                text = event["data"]["chunk"].content
+                if text:
+                    yield sse_event("token", {"text": text})
+            elif kind == "on_tool_start":
+                yield sse_event("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+            elif kind == "on_tool_end":
+                result = str(event["data"].get("output", ""))
+                yield sse_event("tool_end", {"tool": event["name"], "output": result[:TOOL_OUTPUT_PREVIEW_CHARS]})
+                if len(tables) > sent:
+                    sent = len(tables)
+                    yield sse_event("result", chat_payload("", last_result(tables), request.result_format)["result"])
+            elif kind == "on_chain_end" and event["name"] == agent.get_name():
+                output = event["data"]["output"]["output"]
+
+        result = last_result(tables)
+        if cache_key is not None and output is not None:
+            answer_cache.set(cache_key, {"output": output, "result": result})
+        yield sse_event("done", {"output": output, "sql": result["sql"] if result else None})
+    except Exception as e:
+        logger.exception("Streaming agent run failed")
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        trace = tracing.current_trace()
+        if trace is not None:
+            trace.finish()
+
+async def _cached_event_stream(output: str, result: Optional[dict] = None, result_format: str = "json", **extra):
+    if result is not None:
+        yield sse_event("result", chat_payload(output, result, result_format)["result"])
+    yield sse_event("token", {"text": output})
+    yield sse_event("done", {"output": output, "sql": result["sql"] if result else None, "cached": True, **extra})
+    trace = tracing.current_trace()
+    if trace is not None:
+        trace.finish()
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, current: CurrentUser = Depends(get_current_user)):
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    routed = intent_router.route(request.input, request.history)
+    if routed is not None:
+        tracing.record_intent(routed.intent)
+        return StreamingResponse(_cached_event_stream(routed.output, cached=False, intent=routed.intent), media_type="text/event-stream", headers=headers)
+
+    cache_key = await run_blocking(answer_cache_key, request.input, request.history)
+    if cache_key is not None:
+        cached = answer_cache.get(cache_key)
+        tracing.record_cache("answer", cached is not None)
+        if cached is not None:
+            return StreamingResponse(_cached_event_stream(cached["output"], cached["result"], request.result_format), media_type="text/event-stream", headers=headers)
+
+    templated = await run_blocking(sql_templates.answer, request.input)
+    if templated is not None:
+        tracing.record_template(templated.template)
+        result = templated.result.to_dict()
+        if cache_key is not None:
+            answer_cache.set(cache_key, {"output": templated.output, "result": result})
+        return StreamingResponse(_cached_event_stream(templated.output, result, request.result_format, cached=False, template=templated.template), media_type="text/event-stream", headers=headers)
+
+    # Take the slot before the response starts so overload is a plain 429, not a broken stream
+    try:
+        await agent_limiter.acquire(current.user_id)
+    except AgentBusy as e:
+        return JSONResponse(status_code=429, content={"detail": busy_detail(e)}, headers={"Retry-After": str(e.retry_after)})
+
+    # Released as a background task so it also runs if the client disconnects early;
+    # release is async, so Starlette awaits it on the event loop rather than in a thread
+    return StreamingResponse(
+        _agent_event_stream(request, cache_key),
+        media_type="text/event-stream",
+        headers=headers,
+        background=BackgroundTask(agent_limiter.release, current.user_id)
+    )
+
+@router.post("/export")
+def export_endpoint(request: ExportRequest, current: CurrentUser = Depends(get_current_user)):
+    """
+    Streams the full result of an agent query (by result_id) as CSV or Parquet,
+    straight from a server-side cursor: no LLM, and never more than one chunk in memory.
+    """
+    try:
+        export.check_format(request.format)
+        sql = export.resolve_sql(request.result_id)
+    except SQLGuardException as e:
+        tracing.record_guard_rejection(request.result_id, str(e))
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    slot = export.acquire_slot()
+    if slot is None:
+        raise HTTPException(status_code=429, detail="Too many exports running. Try again shortly.", headers={"Retry-After": "5"})
+
+    # The stream releases the slot itself (Starlette skips `background` when the stream raises);
+    # the background task only covers a stream that never started
+    return StreamingResponse(
+        export.stream_export(sql, request.format, slot),
+        media_type=export.FORMATS[request.format],
+        headers={"Content-Disposition": f'attachment; filename="nexora_export.{request.format}"'},
+        background=BackgroundTask(slot.release)
+    )
+
+@router.get("/cache/stats")
+def cache_stats():
+    return {"answers": answer_cache.stats(), "results": result_cache.stats()}
+
+@router.get("/limits")
+def limits_stats():
+    return agent_limiter.stats()
@@ -1,39 +1,88 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
 from backend.auth.service import AuthService
-from backend.schemas import UserSignup, UserLogin, UserResponse, SaveMessageRequest, ChatMessage
+from backend.auth.hashing import HashingBusy
+from backend.auth.tokens import CurrentUser, get_current_user, create_access_token
+from backend.db import get_db
+from backend.schemas import UserSignup, UserLogin, UserResponse, SaveMessageRequest, SaveMessagesRequest, ChatMessage, ChatHistoryPage
 from typing import List, Optional
 
 router = APIRouter()
 
-def get_auth_service():
-    return AuthService()
+def get_auth_service(db: Session = Depends(get_db)):
+    return AuthService(db)
+
+def busy_response(e: HashingBusy):
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+def token_response(user) -> UserResponse:
+    return UserResponse(
+        id=str(user.id), full_name=user.full_name, email=user.email,
+        access_token=create_access_token(user.id, user.email)
+    )
 
 @router.post("/signup", response_model=UserResponse)
-def signup(user_data: UserSignup, auth: AuthService = Depends(get_auth_service)):
-    user, error = auth.signup(user_data.full_name, user_data.email, user_data.password)
+async def signup(user_data: UserSignup, auth: AuthService = Depends(get_auth_service)):
+    try:
+        user, error = await auth.signup(user_data.full_name, user_data.email, user_data.password)
+    except HashingBusy as e:
+        raise busy_response(e)
     if error:
         raise HTTPException(status_code=400, detail=error)
-    return UserResponse(id=str(user.id), full_name=user.full_name, email=user.email)
+    return token_response(user)
 
 @router.post("/login", response_model=UserResponse)
-def login(user_data: UserLogin, auth: AuthService = Depends(get_auth_service)):
-    user, error = auth.login(user_data.email, user_data.password)
+async def login(user_data: UserLogin, auth: AuthService = Depends(get_auth_service)):
+    try:
+        user, error = await auth.login(user_data.email, user_data.password)
+    except HashingBusy as e:
+        raise busy_response(e)
     if error:
         raise HTTPException(status_code=401, detail=error)
-    return UserResponse(id=str(user.id), full_name=user.full_name, email=user.email)
+    return token_response(user)
+
+@router.get("/me", response_model=UserResponse)
+def me(current: CurrentUser = Depends(get_current_user), auth: AuthService = Depends(get_auth_service)):
+    profile = auth.get_profile(current.user_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="User not found.")
+    return UserResponse(**profile)
 
-@router.get("/history/{user_id}", response_model=List[ChatMessage])
-def get_history(user_id: str, limit: Optional[int] = None, auth: AuthService = Depends(get_auth_service)):
+@router.get("/history", response_model=ChatHistoryPage)
+def get_history(
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    current: CurrentUser = Depends(get_current_user),
+    auth: AuthService = Depends(get_auth_service)
+):
     try:
-        messages = auth.get_chat_history(user_id, limit=limit)
-        return [ChatMessage(role=m.role, content=m.content, timestamp=m.timestamp) for m in messages]
+        rows, next_cursor = auth.get_chat_history(current.user_id, limit=limit, before=before)
+        return ChatHistoryPage(
+            messages=[ChatMessage(role=role, content=content, timestamp=ts) for role, content, ts in rows],
+            next_cursor=next_cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/message")
-def save_message(request: SaveMessageRequest, auth: AuthService = Depends(get_auth_service)):
+def save_message(request: SaveMessageRequest, current: CurrentUser = Depends(get_current_user), auth: AuthService = Depends(get_auth_service)):
     try:
-        auth.save_message(request.user_id, request.role, request.content)
+        auth.save_message(current.user_id, request.role, request.content)
         return {"status": "success"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/messages")
+def save_messages(request: SaveMessagesRequest, current: CurrentUser = Depends(get_current_user), auth: AuthService = Depends(get_auth_service)):
+    """Saves a batch of messages (e.g. a question and its answer) in one call."""
+    try:
+        count = auth.save_messages(current.user_id, [(m.role, m.content) for m in request.messages])
+        return {"status": "success", "count": count}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
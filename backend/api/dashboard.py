@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from backend.db import get_dashboard_stats
+from backend.rollups import get_dashboard_stats
 from backend.schemas import DashboardStats
 
 router = APIRouter()
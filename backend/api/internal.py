@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException
+from backend.db import get_engine
+from backend.pool_metrics import pool_metrics
+from backend.auth.message_buffer import message_buffer
+from backend.tracing import get_trace
+from backend.auth.tokens import require_admin
+
+# Other users' SQL and traffic: admin accounts only
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/pool")
+def pool_stats():
+    """Connection pool telemetry (checked-out, overflow, checkout wait time, pre-ping failures)."""
+    return pool_metrics.snapshot(get_engine().pool)
+
+@router.get("/messages")
+def message_buffer_stats():
+    """Write-behind chat message buffer: queue depth, oldest unwritten message, flush/failure counts."""
+    return message_buffer.stats()
+
+@router.get("/traces/{request_id}")
+def request_trace(request_id: str):
+    """JSON trace of one request (see the X-Request-ID response header): LLM calls, SQL, rejections, cache hits."""
+    trace = get_trace(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (unknown or expired request id).")
+    return trace
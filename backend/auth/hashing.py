@@ -0,0 +1,90 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+# Worker processes dedicated to password hashing, and how many hash jobs may be queued on them
+HASH_WORKERS = int(os.getenv("NEXORA_HASH_WORKERS", "2"))
+HASH_MAX_PENDING = int(os.getenv("NEXORA_HASH_MAX_PENDING", "32"))
+# Hashes below this round count are transparently rehashed on the next successful login
+PBKDF2_ROUNDS = int(os.getenv("NEXORA_PBKDF2_ROUNDS", "29000"))
+
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS
+)
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full; callers should answer 429 rather than wait."""
+    pass
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = 0
+
+# --- Worker-side functions (run in the process pool, must be module-level to pickle) ---
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed_password: str):
+    """Returns (is_valid, new_hash); new_hash is set when the stored hash uses outdated parameters."""
+    if not pwd_context.verify(password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(password)
+    return True, None
+
+# --- Caller side ---
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+        return _pool
+
+def shutdown():
+    """Stops the worker processes (app shutdown hook)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    # Outside the lock: finishing and cancelled jobs run _release, which takes it
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _release(_future):
+    global _pending
+    with _pool_lock:
+        _pending -= 1
+
+def _submit(func, *args):
+    global _pending
+    with _pool_lock:
+        if _pending >= HASH_MAX_PENDING:
+            raise HashingBusy("Too many sign-in requests right now. Please try again in a moment.")
+        _pending += 1
+    try:
+        future = get_pool().submit(func, *args)
+    except BaseException:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    return asyncio.wrap_future(future)
+
+async def hash_password(password: str) -> str:
+    return await _submit(_hash, password)
+
+async def verify_password(password: str, hashed_password: str):
+    """Returns (is_valid, new_hash_or_None). See _verify_and_update."""
+    return await _submit(_verify_and_update, password, hashed_password)
+
+def stats() -> dict:
+    return {"workers": HASH_WORKERS, "pending": _pending, "max_pending": HASH_MAX_PENDING}
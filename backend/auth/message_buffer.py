@@ -0,0 +1,231 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from backend.db import get_engine
+from backend.auth.models import ChatHistory
+
+logger = logging.getLogger(__name__)
+
+# Write-behind settings for chat messages
+FLUSH_INTERVAL_SECONDS = float(os.getenv("NEXORA_MESSAGE_FLUSH_SECONDS", "1.0"))
+FLUSH_BATCH_SIZE = int(os.getenv("NEXORA_MESSAGE_BATCH_SIZE", "500"))
+MAX_PENDING = int(os.getenv("NEXORA_MESSAGE_MAX_PENDING", "10000"))
+# Failed flushes are retried after FLUSH_INTERVAL_SECONDS, doubling up to this cap; queued rows are never dropped for it
+MAX_FLUSH_BACKOFF_SECONDS = float(os.getenv("NEXORA_MESSAGE_MAX_BACKOFF_SECONDS", "60"))
+# Longest message content accepted (characters)
+MAX_MESSAGE_CHARS = int(os.getenv("NEXORA_MESSAGE_MAX_CHARS", "100000"))
+
+# Errors caused by the rows themselves (FK to a deleted user, NUL bytes, bad values), not by the database
+_ROW_ERRORS = (IntegrityError, DataError, ValueError, TypeError)
+
+def check_message(role: str, content: str):
+    """Raises ValueError for content the database can't store (NUL characters) or that is too long."""
+    if "\x00" in role or "\x00" in content:
+        raise ValueError("Messages cannot contain NUL characters.")
+    if len(content) > MAX_MESSAGE_CHARS:
+        raise ValueError(f"Message is too long ({len(content):,} characters, limit {MAX_MESSAGE_CHARS:,}).")
+
+class MessageBuffer:
+    """
+    Write-behind buffer for ChatHistory rows.
+    Messages are queued in memory and written by a background thread as one multi-row
+    INSERT per batch, every FLUSH_INTERVAL_SECONDS or as soon as FLUSH_BATCH_SIZE rows wait.
+    The queue is bounded: when it is full the caller's rows are written synchronously
+    instead, so overload slows senders down rather than dropping messages.
+    A batch the database refuses because of its rows is retried row by row and only the
+    offending rows are dropped; any other failure keeps the batch queued and backs off.
+    """
+    def __init__(self, flush_interval=FLUSH_INTERVAL_SECONDS, batch_size=FLUSH_BATCH_SIZE,
+                 max_pending=MAX_PENDING, max_backoff=MAX_FLUSH_BACKOFF_SECONDS):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff
+        self._queue = deque()  # (enqueued_at, row)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one writer at a time
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._retries = 0
+        # Durability metrics
+        self.enqueued = 0
+        self.written = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.sync_writes = 0
+        self.dropped = 0
+        self.last_flush_at = None
+        self.last_flush_seconds = 0.0
+        self.last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the writer and flushes whatever is still queued (app shutdown hook)."""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.drain()
+        if self.pending:
+            logger.error(f"Message buffer stopped with {self.pending} unwritten messages")
+
+    @property
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def add(self, user_id, messages) -> int:
+        """
+        Queues [(role, content), ...] for one user. Timestamps are assigned here, a microsecond
+        apart, so the batch keeps its order in history. Returns the number of rows accepted.
+        """
+        now = datetime.utcnow()
+        rows = [
+            {"id": uuid.uuid4(), "user_id": user_id, "role": role, "content": content,
+             "timestamp": now + timedelta(microseconds=i)}
+            for i, (role, content) in enumerate(messages)
+        ]
+        if not rows:
+            return 0
+
+        with self._lock:
+            overflow = len(self._queue) + len(rows) > self.max_pending
+            if not overflow:
+                enqueued_at = time.monotonic()
+                self._queue.extend((enqueued_at, row) for row in rows)
+                self.enqueued += len(rows)
+                full_batch = len(self._queue) >= self.batch_size
+
+        if overflow:
+            # Backpressure: write this caller's rows directly
+            self._write(rows)
+            with self._lock:
+                self.sync_writes += len(rows)
+                self.written += len(rows)
+        elif full_batch or self._thread is None:
+            self._wakeup.set()
+            if self._thread is None:
+                # No writer running (e.g. scripts/tests): behave like a plain write
+                self.flush()
+        return len(rows)
+
+    def _write(self, rows):
+        with get_engine().begin() as conn:
+            # executemany: rendered as batched multi-row INSERT ... VALUES by the dialect
+            conn.execute(insert(ChatHistory.__table__), rows)
+
+    def flush(self) -> bool:
+        """Writes up to one batch. Returns True if the batch left the queue (written or dropped)."""
+        with self._flush_lock:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return False
+
+            start = time.perf_counter()
+            try:
+                self._write([row for _, row in batch])
+                written = len(batch)
+            except _ROW_ERRORS as e:
+                # One bad row fails the whole INSERT; isolate it instead of losing the batch
+                logger.warning(f"Chat message batch rejected ({e}); retrying {len(batch)} rows one by one")
+                written = self._write_each(batch)
+                if written is None:
+                    return False
+            except Exception as e:
+                self._requeue(batch, e)
+                return False
+
+            with self._lock:
+                self._retries = 0
+                self.flushes += 1
+                self.written += written
+                self.last_flush_at = time.time()
+                self.last_flush_seconds = time.perf_counter() - start
+            return True
+
+    def _write_each(self, batch):
+        """Row-by-row fallback. Returns the rows written, or None if the database failed midway."""
+        written = 0
+        for i, (_, row) in enumerate(batch):
+            try:
+                self._write([row])
+                written += 1
+            except _ROW_ERRORS as e:
+                with self._lock:
+                    self.dropped += 1
+                    self.last_error = str(e)
+                logger.error(f"Dropping chat message {row['id']} of user {row['user_id']}: {e}")
+            except Exception as e:
+                with self._lock:
+                    self.written += written
+                self._requeue(batch[i:], e)
+                return None
+        return written
+
+    def _requeue(self, batch, error):
+        with self._lock:
+            self.failed_flushes += 1
+            self.last_error = str(error)
+            self._retries += 1
+            # Back in front so ordering is kept for the retry
+            self._queue.extendleft(reversed(batch))
+        logger.warning(f"Chat message flush failed (attempt {self._retries}, retrying in {self.backoff:.0f}s): {error}")
+
+    @property
+    def backoff(self) -> float:
+        """Seconds until the writer retries: the flush interval, doubled per consecutive failure."""
+        return min(self.max_backoff, self.flush_interval * 2 ** self._retries)
+
+    def drain(self):
+        """Flushes until the queue is empty or a flush fails."""
+        while self.pending and self.flush():
+            pass
+
+    def _run(self):
+        while not self._stopping.is_set():
+            if self._retries:
+                # Backing off: full batches don't wake the writer early
+                self._stopping.wait(self.backoff)
+            else:
+                self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            while self.pending and not self._stopping.is_set():
+                if not self.flush():
+                    break
+
+    def stats(self) -> dict:
+        with self._lock:
+            oldest = self._queue[0][0] if self._queue else None
+            return {
+                "pending": len(self._queue),
+                "max_pending": self.max_pending,
+                "oldest_pending_seconds": round(time.monotonic() - oldest, 3) if oldest is not None else 0.0,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+                "sync_writes": self.sync_writes,
+                "dropped": self.dropped,
+                "consecutive_failures": self._retries,
+                "last_flush_at": self.last_flush_at,
+                "last_flush_seconds": round(self.last_flush_seconds, 6),
+                "last_error": self.last_error,
+            }
+
+message_buffer = MessageBuffer()
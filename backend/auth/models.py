@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -21,7 +21,11 @@ class User(Base):
 
 class ChatHistory(Base):
     __tablename__ = 'chat_history'
-    __table_args__ = {'schema': 'nexora_auth'}
+    __table_args__ = (
+        # Backs the keyset-paginated history query (newest first per user; id breaks timestamp ties)
+        Index('ix_chat_history_user_ts', 'user_id', 'timestamp', 'id'),
+        {'schema': 'nexora_auth'},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey('nexora_auth.users.id'), nullable=False)
@@ -31,3 +35,8 @@ class ChatHistory(Base):
 
     # Relationships
     user = relationship("User", back_populates="chat_history")
+
+def ensure_indexes(engine):
+    """Creates indexes declared above that are missing on an existing database (idempotent)."""
+    for index in ChatHistory.__table__.indexes:
+        index.create(engine, checkfirst=True)
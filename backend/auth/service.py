@@ -1,82 +1,148 @@
+import json
+import uuid
+import base64
+import logging
+from datetime import datetime
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
 from backend.auth.models import User, ChatHistory
-from backend.db import get_session
+from backend.auth import hashing
+from backend.auth.tokens import profile_cache, remember_profile
+from backend.auth.message_buffer import message_buffer, check_message
 
+logger = logging.getLogger(__name__)
+
+def as_uuid(user_id):
+    return user_id if isinstance(user_id, uuid.UUID) else uuid.UUID(str(user_id))
+
+def encode_cursor(timestamp, message_id) -> str:
+    """Opaque history cursor: the (timestamp, id) of the oldest message on a page."""
+    raw = json.dumps([timestamp.isoformat(), as_uuid(message_id).hex])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), uuid.UUID(message_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid history cursor.")
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 class AuthService:
-    def __init__(self):
-        self.Session = get_session()
+    def __init__(self, session: Session):
+        # Request-scoped session; its lifecycle is owned by the caller (see backend.db.get_db)
+        self.session = session
 
-    def get_password_hash(self, password):
-        return pwd_context.hash(password)
+    def get_user_by_email(self, email):
+        return self.session.query(User).filter(User.email == email).first()
 
-    def verify_password(self, plain_password, hashed_password):
-        return pwd_context.verify(plain_password, hashed_password)
+    def get_profile(self, user_id):
+        """Returns {"id", "full_name", "email"} for a user, from the profile cache when possible."""
+        profile = profile_cache.get(str(user_id))
+        if profile is not None:
+            return profile
+        user = self.session.get(User, as_uuid(user_id))
+        return remember_profile(user) if user else None
 
-    def signup(self, full_name, email, password):
-        session = self.Session()
+    def create_user(self, full_name, email, password_hash):
+        session = self.session
         try:
-            existing_user = session.query(User).filter(User.email == email).first()
-            if existing_user:
-                return None, "Email already registered."
-
             new_user = User(
                 full_name=full_name,
                 email=email,
-                password_hash=self.get_password_hash(password)
+                password_hash=password_hash
             )
             session.add(new_user)
             session.commit()
             print(f"User created: {new_user.id}") # Debug
+            remember_profile(new_user)
             return new_user, None
         except Exception as e:
             session.rollback()
             return None, str(e)
-        finally:
-            session.close()
 
-    def login(self, email, password):
-        session = self.Session()
+    def update_password_hash(self, user, password_hash):
+        """
+        Stores an upgraded hash. `user` stays loaded after the commit: the login path reads
+        it on the event loop next, where an expired instance would reload synchronously.
+        """
+        session = self.session
+        expire_on_commit, session.expire_on_commit = session.expire_on_commit, False
         try:
-            user = session.query(User).filter(User.email == email).first()
-            if not user:
-                return None, "Invalid email or password."
-            
-            if not self.verify_password(password, user.password_hash):
-                return None, "Invalid email or password."
-            
-            return user, None
-        finally:
-            session.close()
-
-    def save_message(self, user_id, role, content):
-        session = self.Session()
-        try:
-            msg = ChatHistory(user_id=user_id, role=role, content=content)
-            session.add(msg)
+            user.password_hash = password_hash
             session.commit()
         except Exception as e:
             session.rollback()
-            print(f"Error saving message: {e}")
+            session.refresh(user)  # rollback expires it; reload here, on the threadpool
+            logger.warning(f"Error rehashing password: {e}")
         finally:
-            session.close()
+            session.expire_on_commit = expire_on_commit
 
-    def get_chat_history(self, user_id, limit=None):
-        session = self.Session()
-        try:
-            # Fetch messages
-            query = session.query(ChatHistory)\
-                .filter(ChatHistory.user_id == user_id)\
-                .order_by(ChatHistory.timestamp.desc())
-            
-            if limit:
-                query = query.limit(limit)
-            
-            messages = query.all()
-            # Return reversed so they are chronologically ascending
-            return messages[::-1]
-        finally:
-            session.close()
+    async def signup(self, full_name, email, password):
+        # DB work stays on the threadpool; the hash itself runs in the hashing process pool
+        existing_user = await run_in_threadpool(self.get_user_by_email, email)
+        if existing_user:
+            return None, "Email already registered."
+
+        password_hash = await hashing.hash_password(password)
+        return await run_in_threadpool(self.create_user, full_name, email, password_hash)
+
+    async def login(self, email, password):
+        user = await run_in_threadpool(self.get_user_by_email, email)
+        if not user:
+            return None, "Invalid email or password."
+
+        is_valid, new_hash = await hashing.verify_password(password, user.password_hash)
+        if not is_valid:
+            return None, "Invalid email or password."
+
+        # Hashes created with old parameters are upgraded transparently
+        if new_hash:
+            await run_in_threadpool(self.update_password_hash, user, new_hash)
+
+        remember_profile(user)
+        return user, None
+
+    def save_message(self, user_id, role, content):
+        self.save_messages(user_id, [(role, content)])
+
+    def save_messages(self, user_id, messages):
+        """
+        Queues [(role, content), ...] on the write-behind buffer; they are inserted in batches.
+        Raises ValueError for content the database would refuse, before anything is queued.
+        """
+        for role, content in messages:
+            check_message(role, content)
+        return message_buffer.add(as_uuid(user_id), messages)
+
+    def get_chat_history(self, user_id, limit=50, before=None):
+        """
+        One page of a user's history, newest page first, messages in chronological order.
+        Keyset pagination on (timestamp, id): `before` is the cursor returned with the previous
+        page, so each page is a single index range scan however deep the user scrolls.
+        Returns (rows, next_cursor) where rows are (role, content, timestamp) tuples and
+        next_cursor is None when there is nothing older.
+        """
+        if before is None:
+            # Read-your-writes for the latest page: persist anything still buffered first
+            message_buffer.drain()
+
+        table = ChatHistory.__table__
+        # Rows without a timestamp (legacy inserts) have no place in the keyset order and
+        # can't be encoded in a cursor, so they are left out
+        stmt = select(table.c.id, table.c.role, table.c.content, table.c.timestamp)\
+            .where(table.c.user_id == as_uuid(user_id), table.c.timestamp.isnot(None))
+        if before:
+            before_ts, before_id = decode_cursor(before)
+            stmt = stmt.where(tuple_(table.c.timestamp, table.c.id) < tuple_(before_ts, before_id))
+        # One extra row tells us whether an older page exists
+        stmt = stmt.order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(limit + 1)
+
+        rows = self.session.execute(stmt).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+        # Return reversed so they are chronologically ascending
+        return [(r.role, r.content, r.timestamp) for r in reversed(rows)], next_cursor
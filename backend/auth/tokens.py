@@ -0,0 +1,115 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import secrets
+from dataclasses import dataclass
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+from backend.cache import LRUCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Signed access tokens (HS256 JWT), verified in-process with no database lookup
+TOKEN_TTL_SECONDS = int(os.getenv("NEXORA_TOKEN_TTL_SECONDS", str(12 * 3600)))
+TOKEN_ALGORITHM = "HS256"
+
+# Accounts allowed on the /internal endpoints (comma-separated emails); empty means nobody
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("NEXORA_ADMIN_EMAILS", "").split(",") if e.strip()}
+
+SECRET_KEY = os.getenv("SECRET_KEY")
+if not SECRET_KEY:
+    # Local/dev fallback: tokens stop verifying when the process restarts
+    SECRET_KEY = secrets.token_urlsafe(32)
+    logger.warning("SECRET_KEY is not set; using a random per-process key for access tokens.")
+
+# user_id -> {"id", "full_name", "email"}; filled at login so endpoints needing the name skip the users table
+profile_cache = LRUCache(
+    maxsize=int(os.getenv("NEXORA_PROFILE_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("NEXORA_PROFILE_CACHE_TTL", "3600"))
+)
+
+class InvalidToken(Exception):
+    pass
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """Identity taken from a verified access token."""
+    user_id: str
+    email: Optional[str] = None
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+def _sign(signing_input: bytes) -> bytes:
+    return hmac.new(SECRET_KEY.encode(), signing_input, hashlib.sha256).digest()
+
+def create_access_token(user_id: str, email: Optional[str] = None, ttl: int = TOKEN_TTL_SECONDS) -> str:
+    now = int(time.time())
+    header = {"alg": TOKEN_ALGORITHM, "typ": "JWT"}
+    claims = {"sub": str(user_id), "email": email, "iat": now, "exp": now + ttl}
+    signing_input = ".".join(
+        _b64encode(json.dumps(part, separators=(",", ":")).encode()) for part in (header, claims)
+    )
+    return f"{signing_input}.{_b64encode(_sign(signing_input.encode()))}"
+
+def decode_access_token(token: str) -> dict:
+    """Checks the signature and expiry and returns the claims. Raises InvalidToken."""
+    try:
+        header_b64, claims_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        signature = _b64decode(signature_b64)
+    except ValueError:
+        raise InvalidToken("Malformed token.")
+    if not isinstance(header, dict):
+        raise InvalidToken("Malformed token.")
+
+    if header.get("alg") != TOKEN_ALGORITHM:
+        raise InvalidToken("Unsupported token algorithm.")
+    if not hmac.compare_digest(signature, _sign(f"{header_b64}.{claims_b64}".encode())):
+        raise InvalidToken("Invalid token signature.")
+
+    try:
+        claims = json.loads(_b64decode(claims_b64))
+    except ValueError:
+        raise InvalidToken("Malformed token.")
+    if not isinstance(claims, dict):
+        raise InvalidToken("Malformed token.")
+    if not claims.get("sub") or claims.get("exp", 0) < time.time():
+        raise InvalidToken("Token expired.")
+    return claims
+
+def remember_profile(user):
+    profile = {"id": str(user.id), "full_name": user.full_name, "email": user.email}
+    profile_cache.set(profile["id"], profile)
+    return profile
+
+_bearer = HTTPBearer(auto_error=False)
+
+def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> CurrentUser:
+    """FastAPI dependency: resolves the caller from the `Authorization: Bearer` token."""
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated.", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = decode_access_token(credentials.credentials)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    return CurrentUser(user_id=claims["sub"], email=claims.get("email"))
+
+def require_admin(current: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+    """FastAPI dependency: like get_current_user, but only for accounts in NEXORA_ADMIN_EMAILS."""
+    if not current.email or current.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required.")
+    return current
@@ -0,0 +1,128 @@
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    # Installed with langchain-openai; the character estimate below is only a fallback
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Token budget for the per-request context message (date line + chat history)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("NEXORA_CONTEXT_TOKEN_BUDGET", "1200"))
+# How many of the newest turns are kept verbatim (if they fit); older ones are compacted
+VERBATIM_TURNS = int(os.getenv("NEXORA_CONTEXT_VERBATIM_TURNS", "2"))
+TOKENIZER_MODEL = "gpt-4o"
+
+_TABLE_ROW = re.compile(r"^\s*\|.*\|\s*$")
+_TABLE_DIVIDER = re.compile(r"^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_CODE_BLOCK = re.compile(r"```.*?```", re.DOTALL)
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # ~4 characters per token for English/markdown
+    return len(text) // 4 + 1
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens]) + " …"
+    return text[:max_tokens * 4] + " …"
+
+def _split_cells(row: str) -> list:
+    return [cell.strip() for cell in row.strip().strip("|").split("|")]
+
+def _summarize_table(lines: list) -> str:
+    """One-line headline for a markdown table: its columns, row count and first (top) row."""
+    header = _split_cells(lines[0])
+    body = [_split_cells(line) for line in lines[1:] if not _TABLE_DIVIDER.match(line)]
+    if not body:
+        return f"[table: {', '.join(header)}]"
+    first = ", ".join(f"{h}={v}" for h, v in zip(header, body[0]))
+    return f"[table of {len(body)} rows ({', '.join(header)}); first row: {first}]"
+
+def compact_message(content: str) -> str:
+    """
+    Shrinks an earlier turn for use as context: markdown tables become a one-line
+    headline, code blocks (echoed SQL) are dropped and blank runs are collapsed.
+    """
+    content = _CODE_BLOCK.sub("[code omitted]", content)
+    out, table = [], []
+    for line in content.splitlines():
+        if _TABLE_ROW.match(line) or (table and _TABLE_DIVIDER.match(line)):
+            table.append(line)
+            continue
+        if table:
+            out.append(_summarize_table(table))
+            table = []
+        if line.strip() or (out and out[-1].strip()):
+            out.append(line)
+    if table:
+        out.append(_summarize_table(table))
+    return "\n".join(out).strip()
+
+def _normalize(chat_history) -> list:
+    turns = []
+    for item in chat_history or []:
+        # Handle dict or tuple inputs for robustness
+        if isinstance(item, dict):
+            role, content = item.get('role', 'user'), item.get('content', '')
+        else:
+            role, content = item
+        turns.append((str(role).upper(), str(content)))
+    return turns
+
+def build_chat_context(chat_history: list = None, today: str = None, budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Builds the per-request part of the system prompt (current date + recent history)
+    within `budget` tokens. The static system prompt is a separate, unchanging message
+    ahead of this one, so the provider's prompt cache can reuse it across requests.
+    Turns are added newest first: the last VERBATIM_TURNS as-is when they fit, older ones
+    (or ones that don't fit) compacted, and the oldest are dropped once the budget is spent.
+    Args:
+        chat_history: List of (role, content) tuples or dictionaries.
+    """
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    context = f"**Current Date**: {today} (Use this for 'today', 'this month', or determining the current year)."
+    turns = _normalize(chat_history)
+    if not turns:
+        return context
+
+    header = "\n\n**Recent Chat History**:\n"
+    footer = "\nUse the above history to understand context (e.g., 'previous month', 'that product')."
+    remaining = budget - count_tokens(context + header + footer)
+
+    lines = []
+    for age, (role, content) in enumerate(reversed(turns)):
+        if remaining <= 0:
+            break
+        line = f"- {role}: {content}"
+        cost = count_tokens(line)
+        if age >= VERBATIM_TURNS or cost > remaining:
+            line = f"- {role}: {compact_message(content)}"
+            cost = count_tokens(line)
+        if cost > remaining:
+            line = truncate_to_tokens(line, remaining)
+            cost = remaining
+        lines.append(line)
+        remaining -= cost
+
+    if not lines:
+        return context
+    return context + header + "\n".join(reversed(lines)) + "\n" + footer
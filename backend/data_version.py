@@ -0,0 +1,76 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from backend.db import get_engine
+from backend.schema_cache import SCHEMA_NAME, SCHEMA_TABLES
+
+logger = logging.getLogger(__name__)
+
+# How often (seconds) the per-table data versions are re-read from the database
+VERSION_CHECK_SECONDS = float(os.getenv("NEXORA_DATA_VERSION_CHECK_SECONDS", "30"))
+
+_versions: Optional[Dict[str, str]] = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+def _read_versions(engine) -> Dict[str, str]:
+    """
+    One round-trip watermark per nexora_sales table.
+    On Postgres this reads the cumulative write counters from pg_stat_user_tables
+    (cheap, and also catches UPDATE/DELETE); elsewhere it falls back to COUNT(*).
+    """
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            rows = conn.execute(text("""
+                SELECT relname, n_tup_ins, n_tup_upd, n_tup_del
+                FROM pg_stat_user_tables
+                WHERE schemaname = :schema
+            """), {"schema": SCHEMA_NAME}).fetchall()
+            return {r[0]: f"{r[1]}:{r[2]}:{r[3]}" for r in rows if r[0] in SCHEMA_TABLES}
+
+        union = " UNION ALL ".join(
+            f"SELECT '{t}', COUNT(*) FROM {SCHEMA_NAME}.{t}" for t in SCHEMA_TABLES
+        )
+        return {r[0]: str(r[1]) for r in conn.execute(text(union)).fetchall()}
+
+def get_data_versions() -> Optional[Dict[str, str]]:
+    """
+    Returns {table: version} for the nexora_sales tables, re-read at most once
+    every VERSION_CHECK_SECONDS. Returns None if versions cannot be determined,
+    in which case callers should bypass their caches.
+    """
+    global _versions, _last_check
+    if _versions is not None and time.monotonic() - _last_check < VERSION_CHECK_SECONDS:
+        return _versions
+
+    with _lock:
+        if _versions is not None and time.monotonic() - _last_check < VERSION_CHECK_SECONDS:
+            return _versions
+        try:
+            _versions = _read_versions(get_engine())
+        except Exception as e:
+            logger.error(f"Data version check failed: {e}")
+            _versions = None
+        _last_check = time.monotonic()
+        return _versions
+
+def get_schema_version() -> Optional[str]:
+    """A single stamp covering every nexora_sales table (None if unknown)."""
+    versions = get_data_versions()
+    if versions is None:
+        return None
+    joined = ",".join(f"{t}={versions.get(t)}" for t in SCHEMA_TABLES)
+    return hashlib.sha1(joined.encode()).hexdigest()[:16]
+
+def invalidate_data_versions():
+    """Forces the next get_data_versions() call to re-read the stamps (e.g. right after a bulk load)."""
+    global _versions, _last_check
+    with _lock:
+        _versions = None
+        _last_check = 0.0
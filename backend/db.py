@@ -13,6 +13,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 from langchain_community.utilities import SQLDatabase
 from dotenv import load_dotenv
+from backend.schema_cache import CachedSQLDatabase
+from backend.pool_metrics import InstrumentedQueuePool, instrument_engine
 
 load_dotenv()
 
@@ -20,6 +22,7 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 _engine = None
+_session_registry = None
 
 def get_engine():
     global _engine
@@ -33,63 +36,53 @@ def get_engine():
             max_overflow=10,
             pool_timeout=30,
             pool_recycle=1800,
-            pool_pre_ping=True
+            pool_pre_ping=True,
+            poolclass=InstrumentedQueuePool
         )
+        instrument_engine(_engine)
     return _engine
 
 def get_session():
-    engine = get_engine()
-    session_factory = sessionmaker(bind=engine)
-    return scoped_session(session_factory)
+    """
+    Returns the process-wide session registry (one sessionmaker/scoped_session per process).
+    Calling it yields the thread-local session; call .remove() when done with it.
+    """
+    global _session_registry
+    if _session_registry is None:
+        _session_registry = scoped_session(sessionmaker(bind=get_engine()))
+    return _session_registry
+
+def get_db():
+    """
+    FastAPI dependency yielding a request-scoped session, closed after the response.
+    """
+    session = get_session().session_factory()
+    try:
+        yield session
+    finally:
+        session.close()
 
 def get_db_connection() -> SQLDatabase:
     """
     Creates and returns a LangChain SQLDatabase instance connected to Neon Postgres.
     Restricted to the 'nexora_sales' schema.
+    Table info is served from the shared schema snapshot (see backend/schema_cache.py),
+    so tables are only reflected and sampled when the catalog fingerprint changes.
     """
     try:
         # Create SQLAlchemy engine
         engine = get_engine()
         
         # Initialize SQLDatabase with schema restriction and sample rows enabled
-        db = SQLDatabase(
+        db = CachedSQLDatabase(
             engine,
             schema="nexora_sales",
             include_tables=["customers", "products", "orders"],
             view_support=True,
-            sample_rows_in_table_info=3
+            sample_rows_in_table_info=3,
+            lazy_table_reflection=True
         )
         logger.info("Successfully connected to the database.")
         return db
     except Exception as e:
         raise
-
-def get_dashboard_stats():
-    """
-    Fetches quick stats for the sidebar dashboard.
-    Returns: dict with 'total_customers', 'today_revenue', 'today_orders'
-    """
-    from sqlalchemy import text
-    session = get_session()
-    stats = {}
-    try:
-        # Total Customers
-        res_cust = session.execute(text("SELECT COUNT(*) FROM nexora_sales.customers")).scalar()
-        stats['total_customers'] = res_cust or 0
-        
-        # Today's Revenue & Orders
-        res_today = session.execute(text("""
-            SELECT COUNT(*), COALESCE(SUM(total_amount), 0) 
-            FROM nexora_sales.orders 
-            WHERE DATE(order_date) = CURRENT_DATE
-        """)).fetchone()
-        
-        stats['today_orders'] = res_today[0] if res_today else 0
-        stats['today_revenue'] = float(res_today[1]) if res_today else 0.0
-        
-        return stats
-    except Exception as e:
-        logger.error(f"Stats Error: {e}")
-        return {'total_customers': 0, 'today_revenue': 0, 'today_orders': 0}
-    finally:
-        session.close()
@@ -0,0 +1,210 @@
+import io
+import os
+import csv
+import time
+import logging
+import threading
+from decimal import Decimal
+from typing import Iterator, Optional
+
+from sqlalchemy import text
+
+from backend.db import get_engine
+from backend.guards import validate_sql
+from backend.query_runner import result_registry, ensure_limit, check_plan, FETCH_CHUNK_ROWS
+from backend.schema_cache import SCHEMA_NAME
+from backend import tracing
+
+logger = logging.getLogger(__name__)
+
+# Exports run longer than agent queries, but are still bounded
+EXPORT_TIMEOUT_MS = int(os.getenv("NEXORA_EXPORT_TIMEOUT_MS", "120000"))
+EXPORT_MAX_ROWS = int(os.getenv("NEXORA_EXPORT_MAX_ROWS", "1000000"))
+# Planner cost ceiling for an export (EXPLAIN units); exports read up to EXPORT_MAX_ROWS rows
+EXPORT_MAX_PLAN_COST = float(os.getenv("NEXORA_EXPORT_MAX_PLAN_COST", "10000000"))
+# Each running export holds one pooled connection for its whole duration
+EXPORT_CONCURRENCY = int(os.getenv("NEXORA_EXPORT_CONCURRENCY", "2"))
+
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+class ExportError(Exception):
+    """Raised for export requests that can't be served (unknown result, bad format, ...)."""
+    pass
+
+_slots = threading.BoundedSemaphore(EXPORT_CONCURRENCY)
+
+class ExportSlot:
+    """One of the EXPORT_CONCURRENCY export slots. release() is idempotent."""
+    def __init__(self):
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        _slots.release()
+
+def acquire_slot() -> Optional[ExportSlot]:
+    """A slot, or None when EXPORT_CONCURRENCY exports are already running."""
+    return ExportSlot() if _slots.acquire(blocking=False) else None
+
+def resolve_sql(result_id: str) -> str:
+    """
+    The SQL behind a registered agent result. Only SQL the agent already ran can be
+    exported; it is re-checked with validate_sql and, on Postgres, with the EXPLAIN cost
+    gate at export size (QueryRejected), before any response headers are sent.
+    """
+    entry = result_registry.get(result_id) if result_id else None
+    if entry is None:
+        raise ExportError(f"Result '{result_id}' has expired or does not exist. Ask the question again to export it.")
+    validate_sql(entry["sql"])
+    engine = get_engine()
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL search_path TO {SCHEMA_NAME}"))
+            check_plan(conn, ensure_limit(entry["sql"], EXPORT_MAX_ROWS), EXPORT_MAX_PLAN_COST)
+    return entry["sql"]
+
+def check_format(fmt: str):
+    if fmt not in FORMATS:
+        raise ExportError(f"Unsupported export format '{fmt}' (expected {' or '.join(FORMATS)}).")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportError("Parquet export requires pyarrow (pip install pyarrow).")
+
+def _stream_rows(sql: str):
+    """
+    Yields the cursor description (name, type_code, ... per column), then lists of rows
+    FETCH_CHUNK_ROWS at a time from a server-side cursor; only one chunk is held in memory.
+    """
+    engine = get_engine()
+    start, rows = time.perf_counter(), 0
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"SET LOCAL statement_timeout = {EXPORT_TIMEOUT_MS}"))
+            conn.execute(text(f"SET LOCAL search_path TO {SCHEMA_NAME}"))
+        result = conn.execution_options(stream_results=True, max_row_buffer=FETCH_CHUNK_ROWS).execute(
+            text(ensure_limit(sql, EXPORT_MAX_ROWS)))
+        yield result.cursor.description
+        for chunk in result.partitions(FETCH_CHUNK_ROWS):
+            rows += len(chunk)
+            yield chunk
+    tracing.record_sql(sql, time.perf_counter() - start, rows)
+    logger.info(f"Exported {rows} rows in {time.perf_counter() - start:.2f}s")
+
+def _csv_value(value):
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    return value
+
+def stream_csv(sql: str) -> Iterator[bytes]:
+    rows = _stream_rows(sql)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column[0] for column in next(rows)])
+    for chunk in rows:
+        writer.writerows([_csv_value(v) for v in row] for row in chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose bytes are handed out (and dropped) after each row group."""
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+# Postgres type OIDs (psycopg2 cursor.description type_code) with a fixed Arrow mapping
+_PG_INTEGER = {20, 21, 23}
+_PG_FLOAT = {700, 701}
+_PG_NUMERIC = 1700
+_PG_BOOL = 16
+_PG_DATE = 1082
+_PG_TIMESTAMP = 1114
+_PG_TIMESTAMPTZ = 1184
+
+def _arrow_column(pa, column):
+    """
+    (Arrow type, value converter) for one cursor.description entry. Types come from the
+    database, never from the values, so every chunk converts to the same schema.
+    Anything unmapped (text, uuid, SQLite columns without type codes) is written as strings.
+    """
+    type_code, scale = column[1], getattr(column, "scale", None)
+    if type_code in _PG_INTEGER:
+        return pa.int64(), None
+    if type_code in _PG_FLOAT:
+        return pa.float64(), None
+    if type_code == _PG_NUMERIC:
+        if scale is not None and 0 <= scale <= 38:
+            return pa.decimal128(38, scale), None
+        # Unconstrained numeric has no fixed scale to declare
+        return pa.float64(), lambda v: None if v is None else float(v)
+    if type_code == _PG_BOOL:
+        return pa.bool_(), None
+    if type_code == _PG_DATE:
+        return pa.date32(), None
+    if type_code == _PG_TIMESTAMP:
+        return pa.timestamp("us"), None
+    if type_code == _PG_TIMESTAMPTZ:
+        return pa.timestamp("us", tz="UTC"), None
+    return pa.string(), lambda v: None if v is None else str(v)
+
+def stream_parquet(sql: str) -> Iterator[bytes]:
+    """One Parquet row group per fetched chunk, written as the chunks arrive."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = _stream_rows(sql)
+    description = next(rows)
+    columns = [_arrow_column(pa, column) for column in description]
+    schema = pa.schema([pa.field(column[0], arrow_type) for column, (arrow_type, _) in zip(description, columns)])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for chunk in rows:
+        arrays = []
+        for i, (arrow_type, convert) in enumerate(columns):
+            values = [row[i] for row in chunk]
+            if convert is not None:
+                values = [convert(v) for v in values]
+            arrays.append(pa.array(values, type=arrow_type))
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def stream_export(sql: str, fmt: str, slot: Optional[ExportSlot] = None) -> Iterator[bytes]:
+    """
+    Streams the result as `fmt` ("csv" or "parquet"); call check_format first.
+    `slot` is released when the stream ends, fails or is closed by a disconnecting client.
+    """
+    try:
+        yield from (stream_parquet(sql) if fmt == "parquet" else stream_csv(sql))
+    except Exception:
+        # Headers are already sent, so the client sees a truncated download
+        tracing.record_sql(sql, 0.0, None, outcome="error")
+        logger.exception("Export failed mid-stream")
+        raise
+    finally:
+        if slot is not None:
+            slot.release()
@@ -1,66 +1,375 @@
+import os
 import re
+import difflib
+from typing import Dict, List
+
 import sqlparse
+from sqlparse import sql
+from sqlparse import tokens as T
+
+from backend.cache import LRUCache
+from backend.schema_cache import SCHEMA_TABLES
 
 class SQLGuardException(Exception):
     """Custom exception for SQL safety violations."""
     pass
 
-def validate_sql(sql_query: str):
+ALLOWED_SCHEMAS = {"nexora_sales"}
+
+# Keywords that never belong in a read-only query, wherever they appear (including CTEs/subqueries).
+# DML/DDL tokens are also rejected by type; this adds the ones sqlparse tags as plain keywords.
+FORBIDDEN_KEYWORDS = {
+    'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'DROP', 'ALTER', 'TRUNCATE', 'CREATE',
+    'GRANT', 'REVOKE', 'INTO', 'COPY', 'CALL', 'DO', 'EXECUTE', 'PREPARE', 'DEALLOCATE',
+    'LOCK', 'VACUUM', 'ANALYZE', 'CLUSTER', 'REINDEX', 'SET', 'RESET', 'LISTEN', 'NOTIFY',
+    'COMMENT', 'REFRESH', 'DISCARD', 'IMPORT'
+}
+
+# Functions the agent may call. Anything else (pg_sleep, dblink, lo_import, set_config, ...) is rejected.
+ALLOWED_FUNCTIONS = {
+    # aggregates
+    'count', 'sum', 'avg', 'min', 'max', 'string_agg', 'array_agg', 'bool_and', 'bool_or', 'every',
+    'stddev', 'stddev_pop', 'stddev_samp', 'variance', 'var_pop', 'var_samp',
+    'percentile_cont', 'percentile_disc', 'mode', 'corr', 'covar_pop', 'covar_samp', 'filter',
+    # window
+    'row_number', 'rank', 'dense_rank', 'percent_rank', 'cume_dist', 'ntile',
+    'lag', 'lead', 'first_value', 'last_value', 'nth_value',
+    # conditional / comparison
+    'coalesce', 'nullif', 'greatest', 'least', 'any', 'all', 'exists',
+    # math
+    'abs', 'ceil', 'ceiling', 'floor', 'round', 'trunc', 'mod', 'power', 'sqrt', 'exp', 'ln', 'log',
+    'sign', 'div', 'width_bucket',
+    # string
+    'lower', 'upper', 'initcap', 'length', 'char_length', 'concat', 'concat_ws', 'substring', 'substr',
+    'left', 'right', 'trim', 'ltrim', 'rtrim', 'btrim', 'replace', 'position', 'strpos', 'split_part',
+    'lpad', 'rpad', 'repeat', 'reverse', 'format', 'regexp_replace', 'regexp_match', 'starts_with',
+    # date / time / casting
+    'cast', 'date', 'date_trunc', 'date_part', 'extract', 'now', 'age', 'make_date', 'make_interval',
+    'justify_interval', 'to_char', 'to_number', 'to_date', 'to_timestamp', 'generate_series',
+}
+
+# Verdicts keyed by SQL fingerprint: (True, None) for safe, (False, reason) for rejected
+_verdict_cache = LRUCache(maxsize=int(os.getenv("NEXORA_GUARD_CACHE_SIZE", "2048")))
+
+def sql_fingerprint(sql_query: str) -> str:
+    """Cheap cache key (no parsing): whitespace-collapsed text."""
+    return " ".join(sql_query.split())
+
+def _is_relation_keyword(token) -> bool:
+    return token.ttype in T.Keyword and (token.normalized == 'FROM' or token.normalized.endswith('JOIN'))
+
+def _check_relation(identifier):
+    """Rejects relations outside the allowed schemas (or in system catalogs)."""
+    schema = identifier.get_parent_name()
+    name = identifier.get_real_name() or ""
+    if schema is not None and schema.lower() not in ALLOWED_SCHEMAS:
+        raise SQLGuardException(f"Access to schema '{schema}' is not allowed. Only {', '.join(sorted(ALLOWED_SCHEMAS))} may be queried.")
+    if name.lower().startswith("pg_") or name.lower() == "information_schema":
+        raise SQLGuardException(f"Access to system relation '{name}' is not allowed.")
+
+def _cte_names(statement) -> set:
+    """Names defined in a leading WITH clause (their column lists look like function calls to sqlparse)."""
+    names = set()
+    seen_with = False
+    for token in statement.tokens:
+        if token.is_whitespace or token.ttype in T.Comment:
+            continue
+        if token.ttype in T.Keyword.CTE:
+            seen_with = True
+            continue
+        if seen_with:
+            identifiers = token.get_identifiers() if isinstance(token, sql.IdentifierList) else [token]
+            for ident in identifiers:
+                if isinstance(ident, sql.Identifier):
+                    first = ident.token_first(skip_cm=True)
+                    if isinstance(first, sql.Function):
+                        names.add(first.get_name().lower())
+                    elif ident.get_name():
+                        names.add(ident.get_name().lower())
+            break
+    return names
+
+def _unquote(name: str) -> str:
+    return name[1:-1].replace('""', '"') if name.startswith('"') and name.endswith('"') else name.lower()
+
+def _check_call_name(token, cte_names: set):
+    """Allowlist check for a bare or quoted name used as a function (not type casts like numeric(10,2))."""
+    if isinstance(token, sql.Identifier):
+        parts = [t for t in token.tokens if t.ttype in T.Name or t.ttype in T.String.Symbol]
+        if not parts or not (parts[-1].ttype is T.Name or parts[-1].ttype in T.String.Symbol):
+            return
+        names = [_unquote(t.value) for t in parts]
+    elif token.ttype is T.Name or token.ttype in T.String.Symbol:
+        names = [_unquote(token.value)]
+    else:
+        return
+    name = names[-1].lower()
+    if any(n.lower().startswith("pg_") for n in names):
+        raise SQLGuardException(f"Access to system object '{name}' is not allowed.")
+    if len(names) > 1 and names[0].lower() not in ALLOWED_SCHEMAS:
+        raise SQLGuardException(f"Access to schema '{names[0]}' is not allowed. Only {', '.join(sorted(ALLOWED_SCHEMAS))} may be queried.")
+    if name not in ALLOWED_FUNCTIONS and name not in cte_names:
+        raise SQLGuardException(f"Function '{name}' is not allowed.")
+
+# Type names that take a second word: `::character varying(20)`, `::double precision`
+_TYPE_PREFIXES = {'CHARACTER', 'CHAR', 'BIT', 'DOUBLE', 'NATIONAL'}
+
+def _is_call_position(tokens: list, i: int) -> bool:
     """
-    Validates that the SQL query is safe to execute.
-    Rules:
-    - Must be a SELECT statement.
-    - Must not contain multiple statements.
-    - Must not contain DML/DDL keywords (INSERT, UPDATE, DELETE, DROP, ALTER, TRUNCATE).
+    False when name(...) at tokens[i] is not a call: a type with modifiers after `::` or
+    `AS` (x::numeric(10,2), CAST(x AS DECIMAL(12,2))) or a relation alias with a column
+    list ((VALUES ...) v(x), generate_series(1, 3) AS g(n)). Postgres resolves those
+    names as types/aliases and never calls them.
     """
-    # 1. Parse SQL
-    parsed = sqlparse.parse(sql_query)
+    if i == 0:
+        return True
+    previous = tokens[i - 1]
+    leaves = [t for t in previous.flatten() if not (t.is_whitespace or t.ttype in T.Comment)]
+    last = leaves[-1] if leaves else previous
+    if last.value == "::" or last.normalized == "AS" or last.value == ")":
+        return False
+    if last.ttype in T.Keyword and last.normalized in _TYPE_PREFIXES and len(leaves) > 1:
+        return leaves[-2].value != "::" and leaves[-2].normalized != "AS"
+    return True
+
+def _walk(token_list, cte_names: set, in_function: bool = False):
+    """Recursive pass over the parse tree: relation references and function calls."""
+    expect_relation = False
+    tokens = [t for t in token_list.tokens if not (t.is_whitespace or t.ttype in T.Comment)]
+    for i, token in enumerate(tokens):
+        if isinstance(token, sql.Function) and not _is_call_position(tokens, i):
+            # Not a call: only the modifiers / column list are checked
+            for group in token.get_sublists():
+                if isinstance(group, sql.Parenthesis):
+                    _walk(group, cte_names, in_function)
+            continue
+        # A (possibly quoted) name directly followed by parentheses is a call too:
+        # sqlparse parses `"pg_sleep"(5)` as Identifier + Parenthesis, not as a Function
+        if i + 1 < len(tokens) and isinstance(tokens[i + 1], sql.Parenthesis) and _is_call_position(tokens, i):
+            _check_call_name(token, cte_names)
+
+        if expect_relation:
+            expect_relation = False
+            if isinstance(token, sql.IdentifierList):
+                for ident in token.get_identifiers():
+                    if isinstance(ident, sql.Identifier):
+                        _check_relation(ident)
+            elif isinstance(token, sql.Identifier):
+                _check_relation(token)
+
+        if isinstance(token, sql.Function):
+            name = (token.get_name() or "").lower()
+            if name not in ALLOWED_FUNCTIONS and name not in cte_names:
+                raise SQLGuardException(f"Function '{name}' is not allowed.")
+
+        # `FROM` directly inside EXTRACT(... FROM x) / SUBSTRING(... FROM n) is not a relation reference
+        if not in_function and _is_relation_keyword(token):
+            expect_relation = True
+        elif token.is_group:
+            # A function's argument list is "in function"; a parenthesized subquery inside it is not
+            child_in_function = isinstance(token_list, sql.Function) or (
+                in_function and not isinstance(token, sql.Parenthesis)
+            )
+            _walk(token, cte_names, child_in_function)
+
+def _check_sql(sql_query: str):
+    """Full (uncached) check. Raises SQLGuardException with the reason on failure."""
+    # 1. Parse SQL (once)
+    parsed = [s for s in sqlparse.parse(sql_query) if s.token_first(skip_cm=True) is not None]
     if not parsed:
         raise SQLGuardException("Empty or invalid SQL query.")
-    
+
     # 2. Check for multiple statements
     if len(parsed) > 1:
-        # Sometimes sqlparse returns multiple statements for a single query with trailing semicolon + whitespace
-        # Check if actual statements exist
-        statements = [s for s in parsed if s.get_type() != 'UNKNOWN']
-        if len(statements) > 1:
-             raise SQLGuardException("Multi-statement queries are not allowed.")
+        raise SQLGuardException("Multi-statement queries are not allowed.")
 
     statement = parsed[0]
-    
-    # 3. Check statement type
-    if statement.get_type().upper() != 'SELECT':
+
+    # 3. Check statement type: SELECT, or WITH ... SELECT
+    first = statement.token_first(skip_cm=True)
+    if not (first.ttype in T.Keyword.CTE or statement.get_type() == 'SELECT'):
         raise SQLGuardException("Only SELECT queries are allowed.")
 
-    # 4. Keyword Blacklist Check (Double safety)
-    # Check for forbidden keywords explicitly to catch subqueries/CTEs doing funny business if get_type misses it
-    # Note: simple string check might catch 'update_time' column, so use word boundaries
-    forbidden_keywords = {
-        'INSERT', 'UPDATE', 'DELETE', 'DROP', 'ALTER', 'TRUNCATE', 
-        'GRANT', 'REVOKE', 'CREATE', 'REPLACE'
-    }
-    
-    # Flatten tokens to check for DDL/DML keywords
-    # This is a basic heuristic; a robust parser analysis is better but sqlparse `get_type` is usually good for the main statement.
-    # We rely on `get_type` == SELECT mostly.
-    
-    # 5. Schema check (Simple heuristic, strictly agent should be constrained by DB permissions, but prompt asks for check)
-    # We want to ensure we don't query system tables or other schemas roughly.
-    # Accepts 'nexora_sales', 'public' (if explicitly allowed, but here we want only nexora_sales)
-    # Actually, the DB connection is restricted to `nexora_sales` path, so simple table names are fine.
-    # We reject explicit mentions of other schemas.
-    
-    normalized_sql = sql_query.upper()
-    
-    # Check for disallowed schemas if explicitly referenced
-    # This is hard to do perfectly with regex without parsing, but we can look for `schema.table` patterns.
-    # If the user tries `information_schema.tables`, we want to block it.
-    
-    # Simple guard: if dot is present, left side must be 'nexora_sales' or alias
-    # This might be too restrictive for aliasing e.g. "SELECT t.id FROM table t"
-    # So we skip this regex check and rely on the DB user/connection restrictions + system prompt instructions 
-    # and the fact `get_tokens` will return tables.
-    
-    # Relying on statement.get_type() == SELECT is the robust check for DML/DDL.
-    
+    # 4. Keyword check over every token, so data-modifying CTEs/subqueries are caught
+    previous = None
+    for token in statement.flatten():
+        if token.is_whitespace or token.ttype in T.Comment:
+            continue
+        # FOR UPDATE is caught below as UPDATE; FOR SHARE / FOR KEY SHARE take row locks too
+        if token.ttype in T.Keyword and token.normalized == 'SHARE' and previous in ('FOR', 'KEY'):
+            raise SQLGuardException("Row locks (FOR SHARE) are not allowed. Only read-only SELECT queries can be run.")
+        previous = token.normalized
+        if token.ttype in T.Keyword.DML and token.normalized != 'SELECT':
+            raise SQLGuardException(f"'{token.normalized}' is not allowed. Only read-only SELECT queries can be run.")
+        if token.ttype in T.Keyword.DDL or (token.ttype in T.Keyword and token.normalized in FORBIDDEN_KEYWORDS):
+            raise SQLGuardException(f"'{token.normalized}' is not allowed. Only read-only SELECT queries can be run.")
+        if token.ttype in T.Name or token.ttype in T.String.Symbol:
+            name = _unquote(token.value).lower()
+            if name.startswith("pg_") or name == "information_schema":
+                raise SQLGuardException(f"Access to system object '{token.value}' is not allowed.")
+
+    # 5. Schema + function allowlists
+    _walk(statement, _cte_names(statement))
+
+def validate_sql(sql_query: str):
+    """
+    Validates that the SQL query is safe to execute.
+    Rules:
+    - Must be a single SELECT statement (optionally with read-only CTEs).
+    - Must not contain DML/DDL or other state-changing keywords anywhere, including CTEs.
+    - May only call allowlisted functions (no pg_sleep, dblink, ...).
+    - May only reference relations in the nexora_sales schema (no system catalogs).
+    Verdicts are cached by fingerprint, so repeated candidate queries cost a dict lookup.
+    """
+    key = sql_fingerprint(sql_query)
+    verdict = _verdict_cache.get(key)
+    if verdict is None:
+        try:
+            _check_sql(sql_query)
+            verdict = (True, None)
+        except SQLGuardException as e:
+            verdict = (False, str(e))
+        _verdict_cache.set(key, verdict)
+
+    ok, reason = verdict
+    if not ok:
+        raise SQLGuardException(reason)
+    return True
+
+def normalize_sql(sql_query: str) -> str:
+    """
+    Canonical text for a query, used as a cache key.
+    Re-joins the significant tokens with single spaces (so spacing and comments don't matter),
+    drops trailing semicolons and lower-cases unquoted keywords/identifiers.
+    String and numeric literals and quoted identifiers are kept verbatim.
+    """
+    if not sql_query.strip():
+        return ""
+
+    parts = []
+    for token in sqlparse.parse(sql_query)[0].flatten():
+        ttype, value = token.ttype, token.value
+        if ttype in T.Comment or ttype in T.Whitespace or ttype in T.Newline:
+            continue
+        # Numbers stay verbatim: 2.0 (numeric) and 2 (integer) give different results
+        if not (ttype in T.Literal.Number or ttype in T.Literal.String or (ttype in T.Name and value.startswith('"'))):
+            value = value.lower()
+        parts.append(value)
+
+    while parts and parts[-1] == ";":
+        parts.pop()
+
+    normalized = ""
+    for value in parts:
+        if normalized and value != "." and not normalized.endswith("."):
+            normalized += " "
+        normalized += value
+    return normalized
+
+def referenced_tables(sql_query: str) -> List[str]:
+    """Returns the nexora_sales tables mentioned in a query (by name)."""
+    words = set(re.findall(r"[a-z_]+", sql_query.lower()))
+    return [t for t in SCHEMA_TABLES if t in words]
+
+# Field names of EXTRACT(field FROM ...) / date_part that sqlparse reads as plain names
+DATE_PARTS = {
+    "century", "day", "decade", "dow", "doy", "epoch", "hour", "isodow", "isoyear", "julian",
+    "microseconds", "millennium", "milliseconds", "minute", "month", "quarter", "second",
+    "timezone", "timezone_hour", "timezone_minute", "week", "year",
+}
+
+def _suggest(name: str, candidates) -> str:
+    matches = difflib.get_close_matches(name, list(candidates), n=3, cutoff=0.6)
+    return f" Did you mean {' or '.join(repr(m) for m in matches)}?" if matches else ""
+
+def _collect_names(token_list, relations: dict, derived: set, aliases: set, in_function: bool = False):
+    """
+    Recursive pass collecting FROM/JOIN relations (alias -> table), derived-table aliases
+    (subqueries in FROM, whose columns aren't in the catalog) and every declared alias.
+    FROM inside a function call (EXTRACT(MONTH FROM d), TRIM(BOTH ' ' FROM s)) is not a
+    relation; a parenthesised subquery inside a call is searched again, as in _walk.
+    """
+    expect_relation = False
+    for token in token_list.tokens:
+        if token.is_whitespace or token.ttype in T.Comment:
+            continue
+        if isinstance(token, sql.Identifier) and token.get_alias():
+            aliases.add(token.get_alias().lower())
+
+        if expect_relation:
+            expect_relation = False
+            identifiers = token.get_identifiers() if isinstance(token, sql.IdentifierList) else [token]
+            for ident in identifiers:
+                if not isinstance(ident, sql.Identifier):
+                    continue
+                if isinstance(ident.token_first(skip_cm=True), sql.Parenthesis):
+                    derived.add((ident.get_alias() or "").lower())
+                elif ident.get_parent_name() is None or ident.get_parent_name().lower() in ALLOWED_SCHEMAS:
+                    table = (ident.get_real_name() or "").lower()
+                    relations[(ident.get_alias() or table).lower()] = table
+                    relations.setdefault(table, table)
+
+        if not in_function and _is_relation_keyword(token):
+            expect_relation = True
+        if token.is_group:
+            child_in_function = isinstance(token_list, sql.Function) or (
+                in_function and not isinstance(token, sql.Parenthesis)
+            )
+            _collect_names(token, relations, derived, aliases, child_in_function)
+
+def check_identifiers(sql_query: str, catalog: Dict[str, List[List[str]]]):
+    """
+    Checks table and column names against the catalog ({table: [[column, type], ...]},
+    see schema_cache.SchemaSnapshot.columns). Raises SQLGuardException naming the unknown
+    identifier and the closest matches. Names it can't resolve with certainty (columns of
+    subqueries and CTEs, output aliases) are left for the database to judge.
+    """
+    columns = {t.lower(): {c[0].lower() for c in cols} for t, cols in catalog.items()}
+    all_columns = set().union(*columns.values()) if columns else set()
+    statement = sqlparse.parse(sql_query)[0]
+    ctes = _cte_names(statement)
+    relations, derived, aliases = {}, set(), set()
+    _collect_names(statement, relations, derived, aliases)
+
+    # 1. Tables
+    for table in set(relations.values()):
+        if table not in columns and table not in ctes:
+            raise SQLGuardException(
+                f"Table '{table}' does not exist in nexora_sales. "
+                f"Available tables: {', '.join(sorted(columns))}.{_suggest(table, columns)}")
+
+    # 2. Columns, walking the flat token stream: `q.col` is checked against q's table,
+    #    a bare name against every table in the catalog
+    tokens = [t for t in statement.flatten() if not (t.is_whitespace or t.ttype in T.Comment)]
+    # Aliases sqlparse leaves ungrouped: `true AS flag`, `'x' label`, `1 n`
+    for i, token in enumerate(tokens[1:], start=1):
+        before = tokens[i - 1]
+        if token.ttype is T.Name and (
+                before.normalized == "AS" or before.ttype in T.Literal
+                or before.normalized in ("TRUE", "FALSE", "NULL")):
+            aliases.add(_unquote(token.value))
+    known = all_columns | set(relations) | derived | aliases | ctes | DATE_PARTS | {"*"}
+    for i, token in enumerate(tokens):
+        if token.ttype is not T.Name:
+            continue
+        name = token.value.strip('"') if token.value.startswith('"') else token.value.lower()
+        after = tokens[i + 1].value if i + 1 < len(tokens) else ""
+        before = tokens[i - 1].value if i > 0 else ""
+        if after in ("(", "."):
+            continue  # function call or qualifier
+        if before == ".":
+            qualifier = tokens[i - 2].value.lower() if i > 1 else ""
+            table = relations.get(qualifier)
+            if table in columns and name not in columns[table] and qualifier not in ALLOWED_SCHEMAS:
+                raise SQLGuardException(
+                    f"Column '{name}' does not exist on table '{table}'. "
+                    f"Its columns are: {', '.join(sorted(columns[table]))}.{_suggest(name, columns[table])}")
+            continue
+        if ctes or derived or not relations:
+            continue  # bare names may come from a subquery or CTE we don't resolve
+        if name not in known:
+            owners = {c: t for t in relations.values() if t in columns for c in columns[t]}
+            raise SQLGuardException(
+                f"Column '{name}' does not exist on the tables in this query "
+                f"({', '.join(sorted(set(relations.values())))}).{_suggest(name, owners or all_columns)}")
     return True
@@ -0,0 +1,316 @@
+"""
+Bulk ingestion for the nexora_sales tables.
+
+Streams a CSV or Parquet file in chunks, validates each chunk against the reflected
+table definition and upserts it through a staging table. On Postgres every chunk is
+sent with COPY FROM STDIN into a temporary staging table and merged with one
+INSERT ... ON CONFLICT; other dialects (SQLite for local runs) use a batched upsert.
+Each chunk is its own transaction, so an interrupted load keeps the chunks already done.
+
+Usage (from the repo root):
+    python -m backend.ingest orders data/orders.parquet [--chunk-size 100000] [--on-error skip]
+"""
+import io
+import os
+import sys
+import time
+import logging
+import argparse
+from typing import Iterator, List, Optional
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, text, types
+from sqlalchemy.dialects import sqlite
+
+from backend.db import get_engine
+from backend.schema_cache import SCHEMA_NAME
+from backend.data_version import invalidate_data_versions
+
+logger = logging.getLogger(__name__)
+
+# Upsert key per loadable table
+TABLE_KEYS = {"customers": "customer_id", "products": "product_id", "orders": "order_id"}
+DEFAULT_CHUNK_ROWS = int(os.getenv("NEXORA_INGEST_CHUNK_ROWS", "100000"))
+# Rejected rows echoed in the error/report
+MAX_REJECT_SAMPLES = 5
+
+class IngestError(Exception):
+    pass
+
+class IngestReport:
+    def __init__(self, table: str, path: str):
+        self.table = table
+        self.path = path
+        self.chunks = 0
+        self.rows_read = 0
+        self.rows_loaded = 0
+        self.rows_inserted = None  # Postgres only
+        self.rows_updated = None
+        self.rows_rejected = 0
+        self.reject_samples = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_loaded / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "table": self.table,
+            "path": self.path,
+            "chunks": self.chunks,
+            "rows_read": self.rows_read,
+            "rows_loaded": self.rows_loaded,
+            "rows_inserted": self.rows_inserted,
+            "rows_updated": self.rows_updated,
+            "rows_rejected": self.rows_rejected,
+            "reject_samples": self.reject_samples,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": round(self.rows_per_sec, 1),
+        }
+
+def reflect_table(engine, table_name: str) -> Table:
+    if table_name not in TABLE_KEYS:
+        raise IngestError(f"Unknown table '{table_name}'. Loadable tables: {', '.join(TABLE_KEYS)}")
+    return Table(table_name, MetaData(), schema=SCHEMA_NAME, autoload_with=engine)
+
+def read_chunks(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yields DataFrames of up to `chunk_rows` rows without loading the whole file."""
+    lower = path.lower()
+    if lower.endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise IngestError("Reading Parquet requires pyarrow (pip install pyarrow).")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif lower.endswith((".csv", ".csv.gz", ".txt")):
+        # Everything as text first; coerce_chunk converts with the table's types
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=str, keep_default_na=False, na_values=[""])
+    else:
+        raise IngestError(f"Unsupported file type: {path} (expected .csv or .parquet)")
+
+def check_columns(df: pd.DataFrame, table: Table) -> List[str]:
+    """Validates the file's columns against the table; returns the columns to load."""
+    columns = [c.strip() for c in df.columns]
+    unknown = sorted(set(columns) - set(table.c.keys()))
+    if unknown:
+        raise IngestError(f"Columns not in {table.fullname}: {', '.join(unknown)}")
+    key = TABLE_KEYS[table.name]
+    if key not in columns:
+        raise IngestError(f"Column '{key}' is required to upsert into {table.fullname}")
+    missing = [
+        c.name for c in table.columns
+        if c.name not in columns and not c.nullable and c.server_default is None and c.default is None
+    ]
+    if missing:
+        raise IngestError(f"Required columns missing for {table.fullname}: {', '.join(missing)}")
+    return [c for c in table.c.keys() if c in columns]
+
+def _coerce_series(series: pd.Series, column_type) -> pd.Series:
+    if isinstance(column_type, types.Integer):
+        values = pd.to_numeric(series, errors="coerce")
+        # Fractional values are type errors for integer columns
+        values = values.where(values.isna() | (values % 1 == 0))
+        return values.astype("Int64")
+    if isinstance(column_type, (types.Numeric, types.Float)):
+        return pd.to_numeric(series, errors="coerce")
+    if isinstance(column_type, types.DateTime):
+        return pd.to_datetime(series, errors="coerce")
+    if isinstance(column_type, types.Date):
+        return pd.to_datetime(series, errors="coerce").dt.date
+    if isinstance(column_type, types.Boolean):
+        mapped = series.astype("string").str.strip().str.lower().map(
+            {"true": True, "t": True, "1": True, "yes": True, "false": False, "f": False, "0": False, "no": False})
+        return mapped.astype("boolean")
+    return series.astype("string")
+
+def coerce_chunk(df: pd.DataFrame, table: Table, columns: List[str]):
+    """
+    Converts each column to the table's type. Returns (valid rows, rejected rows):
+    a row is rejected when a present value fails to convert, when a NOT NULL column
+    is empty, or when a String(n) value is too long.
+    """
+    df = df.rename(columns=lambda c: c.strip())[columns]
+    bad = pd.Series(False, index=df.index)
+    out = {}
+    for name in columns:
+        column = table.c[name]
+        raw = df[name]
+        converted = _coerce_series(raw, column.type)
+        present = raw.notna() & (raw.astype("string").str.strip() != "")
+        bad |= present & converted.isna()
+        if not column.nullable:
+            bad |= converted.isna()
+        length = getattr(column.type, "length", None)
+        if length and isinstance(column.type, types.String):
+            bad |= converted.str.len().fillna(0) > length
+        out[name] = converted
+    coerced = pd.DataFrame(out, index=df.index)
+    return coerced[~bad], df[bad]
+
+def _copy_upsert(conn, table: Table, df: pd.DataFrame, columns: List[str], staging: str):
+    """Postgres: COPY the chunk into the staging table, then merge it in one statement."""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep="\\N")
+    buffer.seek(0)
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+    finally:
+        cursor.close()
+
+    key = TABLE_KEYS[table.name]
+    updates = ", ".join(f'"{c}" = excluded."{c}"' for c in columns if c != key) or f'"{key}" = excluded."{key}"'
+    row = conn.execute(text(f"""
+        WITH upserted AS (
+            INSERT INTO {table.schema}.{table.name} ({column_list})
+            SELECT {column_list} FROM {staging}
+            ON CONFLICT ("{key}") DO UPDATE SET {updates}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM upserted
+    """)).fetchone()
+    conn.execute(text(f"TRUNCATE {staging}"))
+    return row[0], row[1]
+
+def _batched_upsert(conn, table: Table, df: pd.DataFrame, columns: List[str]):
+    """Other dialects (SQLite): executemany upsert of the chunk."""
+    key = TABLE_KEYS[table.name]
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    stmt = sqlite.insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={c: stmt.excluded[c] for c in columns if c != key}
+    )
+    conn.execute(stmt, records)
+
+def _sync_sequence(conn, table: Table):
+    """Moves the key's serial sequence past the loaded ids so application inserts don't collide."""
+    key = TABLE_KEYS[table.name]
+    conn.execute(text(f"""
+        SELECT setval(seq::regclass, GREATEST((SELECT COALESCE(MAX("{key}"), 0) FROM {table.schema}.{table.name}), 1))
+        FROM (SELECT pg_get_serial_sequence('{table.schema}.{table.name}', '{key}') AS seq) s
+        WHERE seq IS NOT NULL
+    """))
+
+def refresh_dependents(updated_existing: bool):
+    """
+    Brings the rollup tables up to date after a load. The cache resets below only reach
+    caches in this process: a running API server notices the load through the
+    pg_stat_user_tables counters it re-reads every NEXORA_DATA_VERSION_CHECK_SECONDS,
+    and its dashboard stats through NEXORA_DASHBOARD_TTL.
+    """
+    # Imported here: rollups pulls in the dashboard cache, which the CLI only needs at the end
+    from backend.rollups import refresh_rollups, rebuild_rollups, _stats_cache
+
+    invalidate_data_versions()
+    try:
+        if updated_existing:
+            # Incremental refresh only recomputes recent days; older updated orders need a rebuild
+            rebuild_rollups()
+        else:
+            with get_engine().begin() as conn:
+                refresh_rollups(conn)
+            _stats_cache.clear()
+    except Exception as e:
+        logger.error(f"Rollup refresh after ingest failed (run rebuild_rollups() later): {e}")
+
+def ingest_file(table_name: str, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                on_error: str = "abort", progress=None) -> IngestReport:
+    """
+    Loads `path` into nexora_sales.<table_name>, upserting on the table's key.
+    on_error: "abort" raises on the first chunk with invalid rows; "skip" drops them
+    and counts them in the report. `progress(report)` is called after every chunk.
+    """
+    engine = get_engine()
+    table = reflect_table(engine, table_name)
+    report = IngestReport(table_name, path)
+    postgres = engine.dialect.name == "postgresql"
+    staging = f"nexora_ingest_{table_name}"
+    columns = None
+    start = time.perf_counter()
+
+    # Chunks commit one by one, so an aborted load still refreshes the rollups for the chunks that made it in
+    try:
+        with engine.connect() as conn:
+            if postgres:
+                conn.execute(text(
+                    f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+                    f"(LIKE {table.schema}.{table.name} INCLUDING DEFAULTS)"
+                ))
+                conn.commit()
+
+            for chunk in read_chunks(path, chunk_rows):
+                if columns is None:
+                    columns = check_columns(chunk, table)
+                report.rows_read += len(chunk)
+                valid, rejected = coerce_chunk(chunk, table, columns)
+                # Within a file the last occurrence of a key wins (ON CONFLICT can't touch a row twice)
+                valid = valid.drop_duplicates(subset=[TABLE_KEYS[table_name]], keep="last")
+
+                if len(rejected):
+                    report.rows_rejected += len(rejected)
+                    room = MAX_REJECT_SAMPLES - len(report.reject_samples)
+                    if room > 0:
+                        report.reject_samples += rejected.head(room).astype(str).to_dict("records")
+                    if on_error == "abort":
+                        raise IngestError(
+                            f"{len(rejected)} invalid rows in chunk {report.chunks + 1} "
+                            f"(e.g. {report.reject_samples[0]}); rerun with --on-error skip to drop them"
+                        )
+
+                with conn.begin():
+                    if postgres:
+                        inserted, updated = _copy_upsert(conn, table, valid, columns, staging)
+                        report.rows_inserted = (report.rows_inserted or 0) + inserted
+                        report.rows_updated = (report.rows_updated or 0) + updated
+                    else:
+                        _batched_upsert(conn, table, valid, columns)
+
+                report.chunks += 1
+                report.rows_loaded += len(valid)
+                report.seconds = time.perf_counter() - start
+                if progress:
+                    progress(report)
+
+            if postgres and report.rows_loaded:
+                with conn.begin():
+                    _sync_sequence(conn, table)
+    finally:
+        report.seconds = time.perf_counter() - start
+        if report.chunks:
+            refresh_dependents(updated_existing=bool(report.rows_updated))
+    logger.info(f"Ingested {report.rows_loaded} rows into {table.fullname} at {report.rows_per_sec:,.0f} rows/sec")
+    return report
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", choices=sorted(TABLE_KEYS))
+    parser.add_argument("path", help="CSV or Parquet file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--on-error", choices=["abort", "skip"], default="abort",
+                        help="what to do with rows that fail type validation")
+    args = parser.parse_args(argv)
+
+    def progress(report):
+        print(f"  chunk {report.chunks}: {report.rows_loaded:,} rows loaded, "
+              f"{report.rows_per_sec:,.0f} rows/sec", flush=True)
+
+    try:
+        report = ingest_file(args.table, args.path, args.chunk_size, args.on_error, progress)
+    except IngestError as e:
+        print(f"Ingest failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    r = report.to_dict()
+    print(f"Loaded {r['rows_loaded']:,} of {r['rows_read']:,} rows into {SCHEMA_NAME}.{r['table']} "
+          f"in {r['seconds']}s ({r['rows_per_sec']:,.0f} rows/sec)")
+    if r["rows_inserted"] is not None:
+        print(f"  inserted {r['rows_inserted']:,}, updated {r['rows_updated']:,}")
+    if r["rows_rejected"]:
+        print(f"  rejected {r['rows_rejected']:,} invalid rows, e.g. {r['reject_samples'][:2]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import os
+import re
+from typing import Optional
+
+# Set NEXORA_INTENT_ROUTER=0 to send every message to the agent
+ROUTER_ENABLED = os.getenv("NEXORA_INTENT_ROUTER", "1") != "0"
+
+# Anything mentioning the business domain goes to the agent, whatever else it contains
+DOMAIN_TERMS = {
+    "sale", "sales", "sold", "sell", "selling", "seller", "revenue", "income", "earning", "earnings",
+    "order", "orders", "ordered", "customer", "customers", "client", "clients", "buyer", "buyers",
+    "product", "products", "item", "items", "stock", "inventory", "category", "categories",
+    "price", "prices", "amount", "quantity", "qty", "payment", "payments", "upi", "cash", "card",
+    "city", "cities", "state", "states", "total", "average", "avg", "sum", "count", "top", "best",
+    "worst", "highest", "lowest", "today", "yesterday", "week", "month", "year", "daily", "monthly",
+    "trend", "growth", "compare", "delivered", "pending", "cancelled", "status", "rs", "spend", "spent",
+}
+
+# The whole message must be greetings/thanks (plus "there", "nexora", ...), so follow-ups
+# that merely open with one ("great, now show for Pune", "ok do that") reach the agent
+_GREETING_WORDS = (
+    r"(hi+|hello+|hey+|hiya|yo|namaste|greetings|good (morning|afternoon|evening|day)|"
+    r"thanks?( you)?|thank you|ok(ay)?|cool|great|bye|goodbye|see you)"
+)
+GREETING = re.compile(
+    rf"^{_GREETING_WORDS}([\s,]+({_GREETING_WORDS}|there|nexora|all|so much|a lot|very much))*[\s!.?]*$"
+)
+IDENTITY = re.compile(r"\b(who are you|what are you|what is nexora|who (made|built|created) you|your name|introduce yourself)\b")
+CAPABILITY = re.compile(
+    r"\b(what can you do|what do you do|how can you help|what (data|tables) do you have|"
+    r"what (questions )?can i ask|your capabilities|help me get started)\b|^(help|\?)$"
+)
+
+# Words that only occur in requests outside sales analytics. Deliberately short: product
+# names are arbitrary ("music systems", "cricket bats", "football jerseys"), so anything
+# less certain goes to the agent
+OUT_OF_DOMAIN_CUES = {
+    "poem", "poems", "poetry", "joke", "jokes", "lyrics", "weather", "recipe", "recipes",
+    "translate", "translation", "horoscope", "homework",
+}
+
+INTRO = 'I am Nexora, an AI Business Analytics Agent created by **Dhruvin Patel**.'
+CAPABILITIES = (
+    "I have access to the **customers**, **orders**, and **products** tables. "
+    "If you have any specific questions or need insights related to sales, products, or revenue, feel free to ask!\n\n"
+    "For example:\n"
+    "- *What were today's sales?*\n"
+    "- *Top 5 customers by spend this month*\n"
+    "- *Which products are low on stock?*"
+)
+TEMPLATES = {
+    "greeting": f"Hello! 👋 {INTRO}\n\n{CAPABILITIES}",
+    "identity": f"{INTRO} I turn your business questions into SQL against the Nexora sales database "
+                f"and summarize the results.\n\n{CAPABILITIES}",
+    "capability": CAPABILITIES,
+    "out_of_domain": (
+        "I can only help with questions about your business data — sales, customers, products, orders and revenue. "
+        "Try asking something like *\"What is this month's revenue?\"*"
+    ),
+}
+
+class RoutedAnswer:
+    def __init__(self, intent: str, output: str):
+        self.intent = intent
+        self.output = output
+
+_WORD = re.compile(r"[a-z]+")
+
+def _normalize(message: str) -> str:
+    return re.sub(r"\s+", " ", message.strip().lower())
+
+def classify(message: str) -> str:
+    """
+    Returns "greeting", "identity", "capability", "out_of_domain" or "data".
+    Deterministic: domain vocabulary wins, then the regex intents, then the unambiguous
+    out-of-domain cue words. Anything uncertain is "data".
+    """
+    text = _normalize(message)
+    if not text:
+        return "capability"
+    words = set(_WORD.findall(text))
+    if words & DOMAIN_TERMS:
+        return "data"
+    if GREETING.match(text):
+        return "greeting"
+    if IDENTITY.search(text):
+        return "identity"
+    if CAPABILITY.search(text):
+        return "capability"
+    if words & OUT_OF_DOMAIN_CUES:
+        return "out_of_domain"
+    return "data"
+
+def route(message: str, history: Optional[list] = None) -> Optional[RoutedAnswer]:
+    """
+    A templated answer for non-data messages, or None when the agent should handle it.
+    Messages with chat history always go to the agent: "ok" or "great" there is a follow-up.
+    """
+    if not ROUTER_ENABLED or history:
+        return None
+    intent = classify(message)
+    if intent == "data":
+        return None
+    return RoutedAnswer(intent, TEMPLATES[intent])
@@ -0,0 +1,93 @@
+import os
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+class AgentBusy(Exception):
+    """Raised when an agent request cannot get an execution slot."""
+    def __init__(self, message: str, queue_position: int = 0, retry_after: int = 1):
+        super().__init__(message)
+        self.queue_position = queue_position
+        self.retry_after = retry_after
+
+class ConcurrencyLimiter:
+    """
+    Global + per-user cap on in-flight agent runs, with a bounded wait queue.
+    Requests beyond the queue (or over the per-user cap) are rejected immediately
+    instead of piling up behind slow LLM calls.
+    """
+    def __init__(self, max_inflight: int, max_per_user: int, max_queue: int, queue_timeout: float):
+        self.max_inflight = max_inflight
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_inflight)
+        self._per_user = defaultdict(int)
+        self._inflight = 0
+        self._waiting = 0
+        self.rejected = 0
+
+    async def acquire(self, user_id: str):
+        if self._per_user[user_id] >= self.max_per_user:
+            self.rejected += 1
+            raise AgentBusy("Too many questions in progress for this user. Please wait for the current answer.")
+        # `_waiting` counts admitted requests that don't hold a slot yet
+        if self._inflight + self._waiting >= self.max_inflight + self.max_queue:
+            self.rejected += 1
+            queue_position = self._inflight + self._waiting - self.max_inflight + 1
+            raise AgentBusy("Nexora is busy right now. Please try again shortly.", queue_position=queue_position)
+
+        self._per_user[user_id] += 1
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._release_user(user_id)
+            self.rejected += 1
+            raise AgentBusy("Nexora is busy right now. Please try again shortly.", retry_after=int(self.queue_timeout))
+        except BaseException:
+            self._release_user(user_id)
+            raise
+        finally:
+            self._waiting -= 1
+        self._inflight += 1
+
+    async def release(self, user_id: str):
+        # async so Starlette's BackgroundTask awaits it on the event loop instead of
+        # calling it from a threadpool worker (asyncio.Semaphore isn't thread-safe)
+        self._inflight -= 1
+        self._semaphore.release()
+        self._release_user(user_id)
+
+    def _release_user(self, user_id: str):
+        self._per_user[user_id] -= 1
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            await self.release(user_id)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self._inflight,
+            "waiting": self._waiting,
+            "rejected": self.rejected,
+            "max_inflight": self.max_inflight,
+            "max_per_user": self.max_per_user,
+            "max_queue": self.max_queue,
+        }
+
+agent_limiter = ConcurrencyLimiter(
+    max_inflight=int(os.getenv("NEXORA_AGENT_MAX_INFLIGHT", "8")),
+    max_per_user=int(os.getenv("NEXORA_AGENT_MAX_PER_USER", "2")),
+    max_queue=int(os.getenv("NEXORA_AGENT_MAX_QUEUE", "16")),
+    queue_timeout=float(os.getenv("NEXORA_AGENT_QUEUE_TIMEOUT", "10")),
+)
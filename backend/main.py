@@ -1,11 +1,23 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from backend.api import auth, agent, dashboard
+from backend.api import auth, agent, dashboard, internal
+from backend.agent import get_agent_executor
+from backend.rollups import ensure_rollup_tables
+from backend.auth import hashing
+from backend.auth.models import ensure_indexes
+from backend.auth.message_buffer import message_buffer
+from backend.db import get_engine
+from backend.tracing import TracingMiddleware
+from backend.metrics import registry
 from dotenv import load_dotenv
+import logging
 import os
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Nexora Analytics API", version="1.0.0")
 
 # CORS Configuration
@@ -22,10 +34,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request traces (LLM calls, SQL, guard rejections, cache hits) and request metrics
+app.add_middleware(TracingMiddleware)
+
 # Include Routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(agent.router, prefix="/agent", tags=["Agent"])
 app.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard"])
+app.include_router(internal.router, prefix="/internal", tags=["Internal"])
+
+@app.on_event("startup")
+def warm_agent():
+    # Build the shared agent runtime up front so the first question doesn't pay for it.
+    # A failure here is not fatal: the runtime is retried lazily on the next /agent/chat call.
+    try:
+        get_agent_executor()
+    except Exception as e:
+        logger.error(f"Agent warm-up failed: {e}")
+
+@app.on_event("startup")
+def prepare_rollups():
+    # Without the rollup tables /dashboard/stats falls back to live queries
+    try:
+        ensure_rollup_tables()
+    except Exception as e:
+        logger.error(f"Rollup table setup failed: {e}")
+
+@app.on_event("startup")
+def prepare_auth_indexes():
+    # Adds the (user_id, timestamp) history index to databases created before it existed
+    try:
+        ensure_indexes(get_engine())
+    except Exception as e:
+        logger.error(f"Auth index setup failed: {e}")
+
+@app.on_event("startup")
+def start_message_writer():
+    message_buffer.start()
+
+@app.on_event("shutdown")
+def stop_hash_workers():
+    hashing.shutdown()
+
+@app.on_event("shutdown")
+def flush_messages():
+    # Writes any chat messages still waiting in the write-behind buffer
+    message_buffer.stop()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition of the counters/histograms in backend/metrics.py."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 def health_check():
@@ -0,0 +1,118 @@
+import math
+import threading
+from typing import Dict, Sequence, Tuple
+
+# Latency buckets in seconds (HTTP requests, LLM calls, SQL statements)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 1000, 10000, 100000)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Counter:
+    """Monotonic counter with optional labels (rendered in Prometheus text format)."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + _labels(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels (rendered in Prometheus text format)."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values: Dict[Tuple, list] = {}  # key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            entry = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, entry in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, entry):
+                    out.append((self.name + "_bucket" + _labels(self.labelnames, key, f'le="{_number(bound)}"'), count))
+                out.append((self.name + "_sum" + _labels(self.labelnames, key), entry[-2]))
+                out.append((self.name + "_count" + _labels(self.labelnames, key), entry[-1]))
+        return out
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "nexora_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+http_latency = registry.register(Histogram(
+    "nexora_http_request_seconds", "HTTP request latency (time to response start).", ("route",)))
+llm_calls = registry.register(Counter(
+    "nexora_llm_calls_total", "LLM calls by outcome.", ("outcome",)))
+llm_latency = registry.register(Histogram(
+    "nexora_llm_call_seconds", "LLM call latency."))
+llm_tokens = registry.register(Counter(
+    "nexora_llm_tokens_total", "LLM tokens by direction (in = prompt, out = completion).", ("direction",)))
+sql_queries = registry.register(Counter(
+    "nexora_sql_queries_total", "Agent SQL statements by outcome (ok, cached, error); rejections are counted separately.", ("outcome",)))
+sql_latency = registry.register(Histogram(
+    "nexora_sql_seconds", "Agent SQL execution time (including the EXPLAIN gate)."))
+sql_rows = registry.register(Histogram(
+    "nexora_sql_rows", "Rows returned by agent SQL.", buckets=ROW_BUCKETS))
+guard_rejections = registry.register(Counter(
+    "nexora_guard_rejections_total", "Agent SQL rejected by the guards, the query checker or the plan cost gate.", ("reason",)))
+cache_lookups = registry.register(Counter(
+    "nexora_cache_lookups_total", "Cache lookups by cache and result (hit, miss).", ("cache", "result")))
+intent_routes = registry.register(Counter(
+    "nexora_intent_routes_total", "Messages answered by the local intent router instead of the agent.", ("intent",)))
+template_answers = registry.register(Counter(
+    "nexora_template_answers_total", "Questions answered by a vetted SQL template instead of the agent.", ("template",)))
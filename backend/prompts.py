@@ -1,4 +1,6 @@
+from langchain_core.messages import AIMessage, SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_community.agent_toolkits.sql.prompt import SQL_FUNCTIONS_SUFFIX
 
 SYSTEM_PREFIX = """You are **Nexora**, an expert AI Business Intelligence & Sales Analytics Agent.
 Your role is to empower business users with data-driven insights by querying the 'nexora_sales' PostgreSQL database.
@@ -44,8 +46,8 @@ If asked "What can you do?", respond by summarizing: *"I have access to customer
 ### **5. Response Presentation Guidelines**
 - **Currency**: **ALWAYS** format monetary values with **"Rs."** prefix (e.g., **Rs. 12,500.00**).
 - **Tables**: 
-  - If results have >1 row, use a **Markdown Table**.
-  - Keep it clean.
+  - The rows returned by `sql_db_query` are shown to the user automatically as an interactive table.
+  - **Do NOT** repeat them as a Markdown table; write only the narrative (key figures and totals).
 - **Insights**: 
   - Don't just dump data. Add a one-line analysis (e.g., "Top seller by revenue was X").
 
@@ -53,5 +55,34 @@ If asked "What can you do?", respond by summarizing: *"I have access to customer
 - If a query fails, explain in business terms (e.g., "No sales records found for this criteria").
 """
 
-# We will use the default agent prompt construction but inject our prefix.
-# Or if using `create_sql_agent` with strict prompt, we pass this in `system_message` or `prefix`.
+# Agent prompt compiled once per process.
+# SYSTEM_PREFIX is passed as a literal message (no templating), and the per-request
+# bits (current date, recent chat history) are injected through `{context}` at invoke time.
+AGENT_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=SYSTEM_PREFIX),
+    ("system", "{context}"),
+    ("human", "{input}"),
+    AIMessage(content=SQL_FUNCTIONS_SUFFIX),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
+
+# Single-shot mode (NEXORA_AGENT_MODE=single_shot): the compact schema is part of the
+# prompt and `sql_db_query` is the only tool, so there are no list/schema/checker turns.
+# `{schema}` is schema_cache.compact_schema, supplied per request by agent.build_agent_inputs.
+SINGLE_SHOT_PROTOCOL = """### **7. Database Schema (already loaded, do not look it up)**
+Tables in `nexora_sales` (the search path is set, so plain table names work):
+{schema}
+
+### **8. Query Protocol**
+1. **Plan**: write ONE PostgreSQL query that answers the question using only the columns above.
+2. **Execute**: run it with `sql_db_query`.
+3. **Answer**: reply from the result. Only if the tool returns an error, fix the query and run it once more.
+"""
+
+SINGLE_SHOT_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=SYSTEM_PREFIX),
+    ("system", SINGLE_SHOT_PROTOCOL),
+    ("system", "{context}"),
+    ("human", "{input}"),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
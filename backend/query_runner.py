@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import uuid
+import logging
+
+import sqlparse
+from sqlparse import tokens as T
+from sqlalchemy import text
+from langchain_community.utilities.sql_database import truncate_word
+
+from backend.guards import SQLGuardException
+from backend.cache import LRUCache
+from backend.result_summary import ResultSummary
+from backend.result_table import build_result_table, RESULT_TABLE_MAX_ROWS
+from backend import tracing
+
+logger = logging.getLogger(__name__)
+
+# Pre-execution limits for agent-generated SQL (Postgres planner units / rows / milliseconds).
+# There is no row-estimate gate: the agent only ever gets MAX_ROWS_TO_LLM rows or a summary,
+# and large results must stay runnable so they can be exported by result_id
+MAX_PLAN_COST = float(os.getenv("NEXORA_MAX_PLAN_COST", "1000000"))
+DEFAULT_ROW_LIMIT = int(os.getenv("NEXORA_DEFAULT_LIMIT", "100000"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("NEXORA_STATEMENT_TIMEOUT_MS", "15000"))
+
+# Results larger than this are summarized locally instead of being pasted into the LLM context
+MAX_ROWS_TO_LLM = int(os.getenv("NEXORA_MAX_ROWS_TO_LLM", "50"))
+PREVIEW_ROWS = 5
+FETCH_CHUNK_ROWS = 5000
+
+# Handles to large results (the validated SQL + shape), kept so the full result can be exported later
+result_registry = LRUCache(
+    maxsize=int(os.getenv("NEXORA_RESULT_REGISTRY_SIZE", "1000")),
+    ttl=float(os.getenv("NEXORA_RESULT_REGISTRY_TTL", "3600"))
+)
+
+class QueryRejected(SQLGuardException):
+    """Raised when a query's plan is too expensive to run. The message is shown to the agent."""
+    pass
+
+def ensure_limit(sql_query: str, limit: int = DEFAULT_ROW_LIMIT) -> str:
+    """Appends an outer LIMIT when the top-level statement has none."""
+    sql_query = sql_query.strip().rstrip(";").strip()
+    statement = sqlparse.parse(sql_query)[0]
+    for token in statement.tokens:
+        if token.ttype in T.Keyword and token.normalized in ('LIMIT', 'FETCH'):
+            return sql_query
+    return f"{sql_query}\nLIMIT {limit}"
+
+def check_plan(conn, sql_query: str, max_cost: float = MAX_PLAN_COST):
+    """
+    Runs EXPLAIN (FORMAT JSON) and rejects plans over the cost threshold.
+    The rejection text tells the agent how to narrow the query.
+    """
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql_query}")).scalar()
+    cost = plan[0]["Plan"]["Total Cost"]
+    if cost > max_cost:
+        raise QueryRejected(
+            f"Query rejected: estimated cost {cost:,.0f} exceeds the limit of {max_cost:,.0f}. "
+            "Narrow it with filters (e.g. a date range), join on key columns, or aggregate before joining."
+        )
+
+def dry_run(db, sql_query: str):
+    """
+    Plans the query without running it, so syntax, type and unknown-identifier errors
+    surface before execution. On Postgres this is the same EXPLAIN (and cost gate) that
+    run_guarded_query applies; elsewhere it is EXPLAIN QUERY PLAN.
+    Raises QueryRejected or the driver's error.
+    """
+    engine = db._engine
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}"))
+            conn.execute(text(f"SET LOCAL search_path TO {db._schema}"))
+            check_plan(conn, ensure_limit(sql_query))
+        else:
+            conn.execute(text(f"EXPLAIN QUERY PLAN {sql_query}"))
+
+def _format_rows(db, rows) -> str:
+    """Formats rows like SQLDatabase.run ("" when there are none)."""
+    if not rows:
+        return ""
+    return str([
+        tuple(truncate_word(value, length=db._max_string_length) for value in row)
+        for row in rows
+    ])
+
+def register_result(sql_query: str, columns, row_count: int) -> str:
+    result_id = uuid.uuid4().hex
+    result_registry.set(result_id, {"sql": sql_query, "columns": list(columns), "row_count": row_count})
+    return result_id
+
+def execute_guarded_query(db, sql_query: str):
+    """
+    Executes an already-validated SELECT for the agent; returns (tool output, ResultTable).
+    On Postgres the transaction gets a statement_timeout and the plan is cost-checked first.
+    Rows are fetched through a server-side cursor: up to MAX_ROWS_TO_LLM rows are returned
+    as-is (formatted like SQLDatabase.run); larger results are streamed in chunks into a
+    ResultSummary and only the summary plus a short preview is returned.
+    The ResultTable (first RESULT_TABLE_MAX_ROWS rows, columnar) is what the client renders.
+    """
+    limited_query = ensure_limit(sql_query)
+    engine = db._engine
+    start = time.perf_counter()
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # SET LOCAL: scoped to this transaction, so nothing leaks back into the pool
+            conn.execute(text(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}"))
+            conn.execute(text(f"SET LOCAL search_path TO {db._schema}"))
+            check_plan(conn, limited_query)
+
+        result = conn.execution_options(stream_results=True, max_row_buffer=FETCH_CHUNK_ROWS).execute(text(limited_query))
+        columns = list(result.keys())
+        head = result.fetchmany(MAX_ROWS_TO_LLM + 1)
+        if len(head) <= MAX_ROWS_TO_LLM:
+            tracing.record_sql(sql_query, time.perf_counter() - start, len(head))
+            result_id = register_result(sql_query, columns, len(head))
+            return _format_rows(db, head), build_result_table(sql_query, columns, head, result_id=result_id)
+
+        summary = ResultSummary(columns)
+        summary.update(head)
+        kept = list(head)
+        for chunk in result.partitions(FETCH_CHUNK_ROWS):
+            summary.update(chunk)
+            if len(kept) < RESULT_TABLE_MAX_ROWS:
+                kept.extend(chunk[:RESULT_TABLE_MAX_ROWS - len(kept)])
+
+    tracing.record_sql(sql_query, time.perf_counter() - start, summary.row_count)
+    summary_dict = summary.to_dict()
+    result_id = register_result(sql_query, columns, summary.row_count)
+    note = ""
+    if limited_query != sql_query.strip().rstrip(";").strip() and summary.row_count >= DEFAULT_ROW_LIMIT:
+        note = f" (capped by the automatic LIMIT {DEFAULT_ROW_LIMIT})"
+
+    output = (
+        f"Result has {summary.row_count} rows{note}, too many to list. "
+        f"Summarize it using these column statistics instead of listing rows.\n"
+        f"Summary: {json.dumps(summary_dict, default=str)}\n"
+        f"Columns: {', '.join(columns)}\n"
+        f"First {PREVIEW_ROWS} rows: {_format_rows(db, head[:PREVIEW_ROWS])}\n"
+        f"Full result id: {result_id}"
+    )
+    return output, build_result_table(sql_query, columns, kept, summary.row_count, result_id)
+
+def run_guarded_query(db, sql_query: str) -> str:
+    """execute_guarded_query without the result table (tool output only)."""
+    return execute_guarded_query(db, sql_query)[0]
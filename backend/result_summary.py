@@ -0,0 +1,94 @@
+from collections import Counter
+from decimal import Decimal
+from datetime import date, datetime
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# Distinct values tracked per text column before the tail is pruned (top-k stays approximate)
+MAX_TRACKED_VALUES = 10000
+
+class ResultSummary:
+    """
+    Compact per-column summary of a result set, updated chunk by chunk so the
+    full result never has to be held in memory:
+    numeric -> min/max/sum/mean, dates -> min/max, everything else -> top-k values.
+    """
+    def __init__(self, columns: List[str], top_k: int = 5):
+        self.columns = list(columns)
+        self.top_k = top_k
+        self.row_count = 0
+        self._kinds = {}  # column -> "numeric" | "temporal" | "categorical"
+        self._stats = {c: {"min": None, "max": None, "sum": 0.0, "count": 0} for c in self.columns}
+        self._values = {c: Counter() for c in self.columns}
+
+    def _kind(self, column: str, series: pd.Series) -> str:
+        if column in self._kinds:
+            return self._kinds[column]
+        sample = series.dropna()
+        if sample.empty:
+            return None
+        if pd.api.types.is_bool_dtype(sample):
+            kind = "categorical"
+        # Driver types only: digit strings (phone numbers, pincodes) stay categorical.
+        # NUMERIC columns arrive as Decimal objects, which pandas keeps as object dtype
+        elif pd.api.types.is_numeric_dtype(sample) or isinstance(sample.iloc[0], Decimal):
+            kind = "numeric"
+        elif pd.api.types.is_datetime64_any_dtype(sample) or isinstance(sample.iloc[0], (date, datetime)):
+            kind = "temporal"
+        else:
+            kind = "categorical"
+        self._kinds[column] = kind
+        return kind
+
+    def update(self, rows):
+        if not rows:
+            return
+        df = pd.DataFrame.from_records(rows, columns=self.columns)
+        self.row_count += len(df)
+
+        for column in self.columns:
+            series = df[column]
+            kind = self._kind(column, series)
+            stats = self._stats[column]
+            if kind == "numeric":
+                values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+                values = values[~np.isnan(values)]
+                if values.size:
+                    lo, hi = values.min(), values.max()
+                    stats["min"] = lo if stats["min"] is None else min(stats["min"], lo)
+                    stats["max"] = hi if stats["max"] is None else max(stats["max"], hi)
+                    stats["sum"] += values.sum()
+                    stats["count"] += values.size
+            elif kind == "temporal":
+                values = series.dropna()
+                if not values.empty:
+                    lo, hi = values.min(), values.max()
+                    stats["min"] = lo if stats["min"] is None else min(stats["min"], lo)
+                    stats["max"] = hi if stats["max"] is None else max(stats["max"], hi)
+            elif kind == "categorical":
+                counts = self._values[column]
+                counts.update(series.dropna().astype(str).value_counts().to_dict())
+                if len(counts) > MAX_TRACKED_VALUES:
+                    self._values[column] = Counter(dict(counts.most_common(MAX_TRACKED_VALUES // 10)))
+
+    def to_dict(self) -> dict:
+        columns = {}
+        for column in self.columns:
+            kind = self._kinds.get(column)
+            stats = self._stats[column]
+            if kind == "numeric" and stats["count"]:
+                columns[column] = {
+                    "min": round(float(stats["min"]), 4),
+                    "max": round(float(stats["max"]), 4),
+                    "sum": round(float(stats["sum"]), 4),
+                    "mean": round(float(stats["sum"] / stats["count"]), 4),
+                }
+            elif kind == "temporal":
+                columns[column] = {"min": str(stats["min"]), "max": str(stats["max"])}
+            elif kind == "categorical":
+                columns[column] = {"top": self._values[column].most_common(self.top_k)}
+            else:
+                columns[column] = {"all_null": True}
+        return {"row_count": self.row_count, "columns": columns}
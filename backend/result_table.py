@@ -0,0 +1,104 @@
+import os
+import base64
+import logging
+import contextvars
+from uuid import UUID
+from decimal import Decimal
+from datetime import date, datetime, time
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rows of a query result returned to the client as a table (the full result stays exportable by id)
+RESULT_TABLE_MAX_ROWS = int(os.getenv("NEXORA_RESULT_TABLE_ROWS", "1000"))
+
+class ResultTable:
+    """
+    A query result in columnar form: column names, a dtype per column and one array per column.
+    Values are already JSON-safe (Decimal -> float, dates -> ISO strings).
+    """
+    def __init__(self, sql: str, columns: List[str], dtypes: List[str], data: List[list],
+                 row_count: int, result_id: Optional[str] = None):
+        self.sql = sql
+        self.columns = columns
+        self.dtypes = dtypes
+        self.data = data
+        self.row_count = row_count
+        self.result_id = result_id
+
+    @property
+    def truncated(self) -> bool:
+        return self.row_count > (len(self.data[0]) if self.data else 0)
+
+    def to_dict(self) -> dict:
+        return {
+            "sql": self.sql, "columns": self.columns, "dtypes": self.dtypes, "data": self.data,
+            "row_count": self.row_count, "truncated": self.truncated, "result_id": self.result_id,
+        }
+
+def _dtype(values: list) -> str:
+    kinds = {type(v) for v in values if v is not None}
+    if not kinds:
+        return "null"
+    if kinds <= {bool}:
+        return "boolean"
+    if kinds <= {int}:
+        return "integer"
+    if kinds <= {int, float, Decimal}:
+        return "float"
+    if kinds <= {datetime}:
+        return "datetime"
+    if kinds <= {date}:
+        return "date"
+    return "string"
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return str(value)
+
+def build_result_table(sql: str, columns, rows, row_count: Optional[int] = None,
+                       result_id: Optional[str] = None) -> ResultTable:
+    """Transposes row tuples (at most RESULT_TABLE_MAX_ROWS) into column arrays."""
+    rows = rows[:RESULT_TABLE_MAX_ROWS]
+    arrays = [list(col) for col in zip(*rows)] if rows else [[] for _ in columns]
+    dtypes = [_dtype(col) for col in arrays]
+    data = [[_json_value(v) for v in col] for col in arrays]
+    return ResultTable(sql, list(columns), dtypes, data, len(rows) if row_count is None else row_count, result_id)
+
+def to_arrow_base64(columns: List[str], data: List[list]) -> Optional[str]:
+    """Arrow IPC stream of a columnar table, base64-encoded. None when pyarrow isn't installed."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        logger.warning("Arrow result format requested but pyarrow is not available")
+        return None
+    batch = pa.record_batch([pa.array(col) for col in data], names=columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return base64.b64encode(sink.getvalue().to_pybytes()).decode()
+
+# Tables produced while answering the current request. The list is created in the
+# request's context and appended to from tool threads (run_blocking copies the context,
+# so the same list object is shared).
+_captured: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("nexora_result_tables", default=None)
+
+def start_capture() -> list:
+    tables = []
+    _captured.set(tables)
+    return tables
+
+def capture(table: Optional[ResultTable]):
+    tables = _captured.get()
+    if tables is not None and table is not None:
+        tables.append(table)
+
+def latest(tables: Optional[list]) -> Optional[ResultTable]:
+    return tables[-1] if tables else None
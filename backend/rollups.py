@@ -0,0 +1,164 @@
+import os
+import logging
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from backend.db import get_engine
+from backend.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_SCHEMA = "nexora_rollup"
+
+# How long (seconds) a computed DashboardStats payload is served from memory
+DASHBOARD_TTL = float(os.getenv("NEXORA_DASHBOARD_TTL", "30"))
+
+_stats_cache = LRUCache(maxsize=1, ttl=DASHBOARD_TTL)
+
+# Trailing days recomputed on every refresh, so late-committed orders are counted
+ROLLUP_RECOMPUTE_DAYS = int(os.getenv("NEXORA_ROLLUP_RECOMPUTE_DAYS", "3"))
+
+def ensure_rollup_tables():
+    """Creates the rollup tables if they don't exist (idempotent, run at startup)."""
+    engine = get_engine()
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ROLLUP_SCHEMA}"))
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {ROLLUP_SCHEMA}.daily_sales (
+                day DATE PRIMARY KEY,
+                orders BIGINT NOT NULL DEFAULT 0,
+                revenue NUMERIC NOT NULL DEFAULT 0,
+                new_customers BIGINT NOT NULL DEFAULT 0
+            )
+        """))
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {ROLLUP_SCHEMA}.watermarks (
+                name TEXT PRIMARY KEY,
+                value BIGINT NOT NULL
+            )
+        """))
+
+def _get_watermark(conn, name: str) -> int:
+    value = conn.execute(
+        text(f"SELECT value FROM {ROLLUP_SCHEMA}.watermarks WHERE name = :name"), {"name": name}
+    ).scalar()
+    return value or 0
+
+def _set_watermark(conn, name: str, value: int):
+    conn.execute(text(f"""
+        INSERT INTO {ROLLUP_SCHEMA}.watermarks (name, value) VALUES (:name, :value)
+        ON CONFLICT (name) DO UPDATE SET value = excluded.value
+    """), {"name": name, "value": value})
+
+def refresh_rollups(conn):
+    """
+    Brings nexora_rollup.daily_sales up to date without scanning all of `orders`.
+    Days are recomputed (not incremented) from the earliest of: the last
+    ROLLUP_RECOMPUTE_DAYS days, and the oldest order_date among ids above the stored
+    high-water mark. Rows committed out of id order or backfilled with old dates are
+    therefore picked up, as long as they fall in one of those ranges.
+    Note: edits to orders older than the window are not; rebuild_rollups() covers that.
+    """
+    if conn.engine.dialect.name == "postgresql":
+        # Serialize concurrent refreshes so two refreshes never interleave their writes
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('nexora_rollup'))"))
+
+    # 1. Orders: recompute every day from `since` on (order_date range, then new ids' dates)
+    last_order = _get_watermark(conn, "orders.order_id")
+    max_order = conn.execute(text("SELECT MAX(order_id) FROM nexora_sales.orders")).scalar() or 0
+    since = date.today() - timedelta(days=ROLLUP_RECOMPUTE_DAYS)
+    if max_order > last_order:
+        oldest_new = conn.execute(text("""
+            SELECT MIN(DATE(order_date)) FROM nexora_sales.orders WHERE order_id > :lo AND order_id <= :hi
+        """), {"lo": last_order, "hi": max_order}).scalar()
+        if oldest_new is not None:
+            since = min(since, date.fromisoformat(str(oldest_new)[:10]))
+    # Zero the range first so days whose orders were deleted don't keep stale totals
+    conn.execute(text(f"UPDATE {ROLLUP_SCHEMA}.daily_sales SET orders = 0, revenue = 0 WHERE day >= :since"),
+                 {"since": since})
+    conn.execute(text(f"""
+        INSERT INTO {ROLLUP_SCHEMA}.daily_sales (day, orders, revenue)
+        SELECT DATE(order_date), COUNT(*), COALESCE(SUM(total_amount), 0)
+        FROM nexora_sales.orders
+        WHERE order_date >= :since
+        GROUP BY DATE(order_date)
+        ON CONFLICT (day) DO UPDATE SET orders = excluded.orders, revenue = excluded.revenue
+    """), {"since": since})
+    if max_order > last_order:
+        _set_watermark(conn, "orders.order_id", max_order)
+
+    # 2. Customers: there is no sign-up date, so the total is counted (a primary-key
+    #    index scan, not an id range that misses late commits) and growth goes to today
+    total = conn.execute(text("SELECT COUNT(*) FROM nexora_sales.customers")).scalar() or 0
+    last_total = _get_watermark(conn, "customers.total")
+    if last_total and total > last_total:
+        # The initial backfill isn't attributed to today
+        conn.execute(text(f"""
+            INSERT INTO {ROLLUP_SCHEMA}.daily_sales (day, new_customers) VALUES (CURRENT_DATE, :added)
+            ON CONFLICT (day) DO UPDATE SET
+                new_customers = {ROLLUP_SCHEMA}.daily_sales.new_customers + excluded.new_customers
+        """), {"added": total - last_total})
+    if total != last_total:
+        _set_watermark(conn, "customers.total", total)
+
+def rebuild_rollups():
+    """Recomputes daily_sales from scratch (e.g. after bulk loads that update existing orders)."""
+    engine = get_engine()
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('nexora_rollup'))"))
+        conn.execute(text(f"DELETE FROM {ROLLUP_SCHEMA}.daily_sales"))
+        conn.execute(text(f"DELETE FROM {ROLLUP_SCHEMA}.watermarks"))
+        refresh_rollups(conn)
+    _stats_cache.clear()
+
+def _live_dashboard_stats(conn) -> dict:
+    """Direct (index-friendly) queries, used when the rollup tables are unavailable."""
+    total_customers = conn.execute(text("SELECT COUNT(*) FROM nexora_sales.customers")).scalar()
+    today = conn.execute(text("""
+        SELECT COUNT(*), COALESCE(SUM(total_amount), 0)
+        FROM nexora_sales.orders
+        WHERE order_date >= CURRENT_DATE AND order_date < CURRENT_DATE + 1
+    """)).fetchone()
+    return {
+        'total_customers': total_customers or 0,
+        'today_orders': today[0] if today else 0,
+        'today_revenue': float(today[1]) if today else 0.0,
+    }
+
+def get_dashboard_stats():
+    """
+    Fetches quick stats for the sidebar dashboard.
+    Returns: dict with 'total_customers', 'today_revenue', 'today_orders'
+    Served from memory for NEXORA_DASHBOARD_TTL seconds; otherwise the rollups are
+    refreshed incrementally and read back with two primary-key lookups.
+    """
+    cached = _stats_cache.get("stats")
+    if cached is not None:
+        return cached
+
+    engine = get_engine()
+    try:
+        with engine.begin() as conn:
+            refresh_rollups(conn)
+            today = conn.execute(text(f"""
+                SELECT orders, revenue FROM {ROLLUP_SCHEMA}.daily_sales WHERE day = CURRENT_DATE
+            """)).fetchone()
+            stats = {
+                'total_customers': _get_watermark(conn, "customers.total"),
+                'today_orders': today[0] if today else 0,
+                'today_revenue': float(today[1]) if today else 0.0,
+            }
+    except Exception as e:
+        logger.error(f"Rollup Stats Error (falling back to live queries): {e}")
+        try:
+            with engine.connect() as conn:
+                stats = _live_dashboard_stats(conn)
+        except Exception as e:
+            logger.error(f"Stats Error: {e}")
+            return {'total_customers': 0, 'today_revenue': 0, 'today_orders': 0}
+
+    _stats_cache.set("stats", stats)
+    return stats
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import inspect, text, MetaData
+from langchain_community.utilities import SQLDatabase
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_NAME = "nexora_sales"
+SCHEMA_TABLES = ["customers", "products", "orders"]
+
+# Where rendered snapshots are persisted between restarts
+CACHE_DIR = os.getenv("NEXORA_CACHE_DIR", ".nexora_cache")
+# How often (seconds) the catalog fingerprint is re-checked against the database
+FINGERPRINT_CHECK_SECONDS = float(os.getenv("NEXORA_SCHEMA_CHECK_SECONDS", "300"))
+
+class SchemaSnapshot:
+    """
+    Rendered table info (DDL + sample rows) for the nexora_sales tables,
+    tagged with the catalog fingerprint it was rendered from.
+    """
+    def __init__(self, fingerprint: str, table_info: Dict[str, str], columns: Dict[str, List[List[str]]]):
+        self.fingerprint = fingerprint
+        self.table_info = table_info  # table -> rendered CREATE TABLE + sample rows
+        self.columns = columns        # table -> [[column_name, data_type], ...]
+
+    def to_dict(self) -> dict:
+        return {"fingerprint": self.fingerprint, "table_info": self.table_info, "columns": self.columns}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SchemaSnapshot":
+        return cls(data["fingerprint"], data["table_info"], data["columns"])
+
+_snapshot: Optional[SchemaSnapshot] = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+def _snapshot_path() -> str:
+    return os.path.join(CACHE_DIR, f"schema_{SCHEMA_NAME}.json")
+
+def read_catalog(engine, schema: str = SCHEMA_NAME, tables: List[str] = SCHEMA_TABLES):
+    """
+    Returns (fingerprint, columns) for the given tables in one catalog round-trip.
+    """
+    columns = {t: [] for t in tables}
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT table_name, column_name, data_type
+                FROM information_schema.columns
+                WHERE table_schema = :schema
+                ORDER BY table_name, ordinal_position
+            """), {"schema": schema}).fetchall()
+        for table_name, column_name, data_type in rows:
+            if table_name in columns:
+                columns[table_name].append([column_name, data_type])
+    else:
+        # Non-Postgres engines (e.g. local SQLite benchmarks) have no information_schema
+        inspector = inspect(engine)
+        for t in tables:
+            columns[t] = [[c["name"], str(c["type"])] for c in inspector.get_columns(t, schema=schema)]
+
+    digest = hashlib.sha256(json.dumps(columns, sort_keys=True).encode()).hexdigest()
+    return digest, columns
+
+def _load_from_disk() -> Optional[SchemaSnapshot]:
+    try:
+        with open(_snapshot_path()) as f:
+            return SchemaSnapshot.from_dict(json.load(f))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable schema snapshot: {e}")
+        return None
+
+def _save_to_disk(snapshot: SchemaSnapshot):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = _snapshot_path() + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot.to_dict(), f)
+        os.replace(tmp_path, _snapshot_path())
+    except OSError as e:
+        logger.warning(f"Could not persist schema snapshot: {e}")
+
+def get_schema_snapshot(db: "CachedSQLDatabase", force: bool = False) -> SchemaSnapshot:
+    """
+    Returns the current schema snapshot, re-rendering it only when the catalog fingerprint changes.
+    The fingerprint itself is checked at most once every FINGERPRINT_CHECK_SECONDS.
+    """
+    global _snapshot, _last_check
+    now = time.monotonic()
+    if not force and _snapshot is not None and now - _last_check < FINGERPRINT_CHECK_SECONDS:
+        return _snapshot
+
+    with _lock:
+        if not force and _snapshot is not None and now - _last_check < FINGERPRINT_CHECK_SECONDS:
+            return _snapshot
+
+        fingerprint, columns = read_catalog(db._engine, db._schema, list(db.get_usable_table_names()))
+        snapshot = _snapshot or _load_from_disk()
+
+        if force or snapshot is None or snapshot.fingerprint != fingerprint:
+            logger.info(f"Rendering schema snapshot for '{SCHEMA_NAME}' (fingerprint {fingerprint[:12]})")
+            snapshot = SchemaSnapshot(fingerprint, db.render_table_info(), columns)
+            _save_to_disk(snapshot)
+
+        _snapshot = snapshot
+        _last_check = time.monotonic()
+        return _snapshot
+
+def compact_schema(db: "CachedSQLDatabase") -> str:
+    """
+    One line per table (`orders(order_id integer, ...)`) from the cached snapshot, for
+    prompts that carry the schema up front instead of looking it up with tools.
+    """
+    snapshot = get_schema_snapshot(db)
+    return "\n".join(
+        f"{table}({', '.join(f'{name} {data_type.lower()}' for name, data_type in columns)})"
+        for table, columns in sorted(snapshot.columns.items())
+    )
+
+class CachedSQLDatabase(SQLDatabase):
+    """
+    SQLDatabase whose table info is served from the shared schema snapshot
+    instead of reflecting and sampling the tables on every `sql_db_schema` call.
+    """
+    def render_table_info(self) -> Dict[str, str]:
+        """Renders DDL + sample rows per table straight from the database."""
+        # Fresh metadata so a changed catalog is re-reflected rather than served stale
+        self._metadata = MetaData()
+        return {t: super(CachedSQLDatabase, self).get_table_info([t]) for t in self.get_usable_table_names()}
+
+    def get_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        all_table_names = self.get_usable_table_names()
+        if table_names is not None:
+            missing_tables = set(table_names).difference(all_table_names)
+            if missing_tables:
+                raise ValueError(f"table_names {missing_tables} not found in database")
+            all_table_names = table_names
+
+        snapshot = get_schema_snapshot(self)
+        tables = sorted(snapshot.table_info[t] for t in set(all_table_names))
+        return "\n\n".join(tables)
@@ -18,25 +18,56 @@ class UserResponse(BaseModel):
     full_name: str
     email: str
     # created_at: datetime # Optional to include
+    # Signed bearer token for the other endpoints (set by /auth/signup and /auth/login)
+    access_token: Optional[str] = None
+    token_type: str = "bearer"
 
 class ChatMessage(BaseModel):
     role: str
     content: str
     timestamp: Optional[datetime] = None
 
+class ChatHistoryPage(BaseModel):
+    messages: List[ChatMessage]  # Chronological order
+    next_cursor: Optional[str] = None  # Pass as `before` to fetch older messages; None when exhausted
+
 class SaveMessageRequest(BaseModel):
-    user_id: str
+    user_id: Optional[str] = None  # Deprecated: the caller is taken from the access token
+    role: str
+    content: str
+
+class MessageIn(BaseModel):
     role: str
     content: str
 
+class SaveMessagesRequest(BaseModel):
+    messages: List[MessageIn]  # In conversation order
+
 # --- Agent Models ---
 class ChatRequest(BaseModel):
     input: str
-    user_id: str
+    user_id: Optional[str] = None  # Deprecated: the caller is taken from the access token
     history: List[dict] # List of {"role": "...", "content": "..."}
+    result_format: str = "json"  # "arrow" also returns the result table as base64 Arrow IPC
+
+class ResultTable(BaseModel):
+    sql: str  # The executed (validated) query
+    columns: List[str]
+    dtypes: List[str]  # integer, float, string, date, datetime, boolean or null
+    data: List[List[Any]]  # One array per column, in `columns` order
+    row_count: int  # Rows in the full result; more than len(data[i]) when truncated
+    truncated: bool = False
+    result_id: Optional[str] = None  # Handle for exporting the full result
+    arrow: Optional[str] = None  # Base64 Arrow IPC stream (result_format="arrow", pyarrow installed)
 
 class ChatResponse(BaseModel):
-    output: str
+    output: str  # Narrative answer
+    sql: Optional[str] = None
+    result: Optional[ResultTable] = None  # Rows of the last query the agent ran, if any
+
+class ExportRequest(BaseModel):
+    result_id: str  # From ChatResponse.result.result_id
+    format: str = "csv"  # "csv" or "parquet"
 
 # --- Dashboard Models ---
 class DashboardStats(BaseModel):
@@ -0,0 +1,403 @@
+import os
+import re
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import text
+
+from backend.db import get_engine
+from backend.cache import LRUCache
+from backend.query_runner import STATEMENT_TIMEOUT_MS, register_result
+from backend.result_table import ResultTable, build_result_table
+from backend import tracing
+
+logger = logging.getLogger(__name__)
+
+# Set NEXORA_SQL_TEMPLATES=0 to send every data question to the agent
+TEMPLATES_ENABLED = os.getenv("NEXORA_SQL_TEMPLATES", "1") != "0"
+DEFAULT_TOP_N = 5
+MAX_TOP_N = 50
+LIST_ROWS = 50
+DEFAULT_LOW_STOCK = 10
+
+# Known categories / cities for slot extraction, refreshed every 10 minutes
+_vocabulary = LRUCache(maxsize=4, ttl=600)
+
+STOPWORDS = {
+    "show", "me", "the", "what", "whats", "are", "were", "was", "is", "list", "give", "which", "of", "by",
+    "in", "for", "our", "my", "a", "an", "all", "with", "from", "please", "who", "did", "do", "does",
+    "get", "find", "display", "tell", "current", "currently", "and", "to", "on", "at", "their", "we",
+    "have", "has", "can", "you", "i", "see", "s", "so", "far", "details", "detail", "report", "us", "nexora",
+}
+
+class TemplateAnswer:
+    def __init__(self, template: str, output: str, sql: str, params: dict, result: Optional[ResultTable] = None):
+        self.template = template
+        self.output = output
+        self.sql = sql
+        self.params = params
+        self.result = result  # Same columnar table (and export result_id) as an agent answer
+
+# --- Slot extraction -------------------------------------------------------------
+
+def _money(value) -> str:
+    return f"Rs. {float(value or 0):,.2f}"
+
+def _start_of_day(day: datetime) -> datetime:
+    return day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _month_start(day: datetime) -> datetime:
+    return _start_of_day(day).replace(day=1)
+
+_DATE_PATTERNS = [
+    (r"\btoday'?s?\b", "today"),
+    (r"\byesterday'?s?\b", "yesterday"),
+    (r"\bthis week'?s?\b", "this_week"),
+    (r"\blast week'?s?\b", "last_week"),
+    (r"\bthis month'?s?\b", "this_month"),
+    (r"\blast month'?s?\b", "last_month"),
+    (r"\bthis year'?s?\b", "this_year"),
+    (r"\blast year'?s?\b", "last_year"),
+    (r"\b(?:last|past) (\d{1,3}) days?\b", "last_n_days"),
+]
+
+def extract_date_range(question: str, now: Optional[datetime] = None):
+    """Returns (remaining text, (start, end, label) or None). `end` is exclusive."""
+    now = now or datetime.now()
+    today = _start_of_day(now)
+    for pattern, kind in _DATE_PATTERNS:
+        match = re.search(pattern, question)
+        if not match:
+            continue
+        if kind == "today":
+            span = (today, today + timedelta(days=1), "today")
+        elif kind == "yesterday":
+            span = (today - timedelta(days=1), today, "yesterday")
+        elif kind == "this_week":
+            start = today - timedelta(days=today.weekday())
+            span = (start, today + timedelta(days=1), "this week")
+        elif kind == "last_week":
+            start = today - timedelta(days=today.weekday() + 7)
+            span = (start, start + timedelta(days=7), "last week")
+        elif kind == "this_month":
+            span = (_month_start(today), today + timedelta(days=1), today.strftime("this month (%b %Y)"))
+        elif kind == "last_month":
+            end = _month_start(today)
+            start = _month_start(end - timedelta(days=1))
+            span = (start, end, start.strftime("last month (%b %Y)"))
+        elif kind == "this_year":
+            span = (today.replace(month=1, day=1), today + timedelta(days=1), f"this year ({today.year})")
+        elif kind == "last_year":
+            start = today.replace(year=today.year - 1, month=1, day=1)
+            span = (start, today.replace(month=1, day=1), f"last year ({start.year})")
+        else:
+            days = int(match.group(1))
+            span = (today - timedelta(days=days - 1), today + timedelta(days=1), f"the last {days} days")
+        return question[:match.start()] + " " + question[match.end():], span
+    return question, None
+
+def extract_top_n(question: str):
+    match = re.search(r"\b(?:top|best|first|highest) (\d{1,3})\b|\b(\d{1,3}) (?:top|best)\b", question)
+    if not match:
+        return question, None
+    # Only the number is taken out; "top" / "best" still identify the template
+    group = 1 if match.group(1) else 2
+    n = int(match.group(group))
+    return question[:match.start(group)] + " " + question[match.end(group):], max(1, min(n, MAX_TOP_N))
+
+def extract_threshold(question: str):
+    match = re.search(r"\b(?:below|under|less than|fewer than) (\d{1,6})\b", question)
+    if not match:
+        return question, None
+    return question[:match.start(1)] + " " + question[match.end(1):], int(match.group(1))
+
+def _known_values(column_sql: str) -> List[str]:
+    values = _vocabulary.get(column_sql)
+    if values is None:
+        with get_engine().connect() as conn:
+            values = [r[0] for r in conn.execute(text(column_sql)).fetchall() if r[0]]
+        # Longest first so "New Delhi" wins over "Delhi"
+        values.sort(key=len, reverse=True)
+        _vocabulary.set(column_sql, values)
+    return values
+
+def extract_value(question: str, column_sql: str):
+    """Finds a known category/city in the question (case-insensitive, whole words)."""
+    for value in _known_values(column_sql):
+        match = re.search(rf"\b{re.escape(value.lower())}\b", question)
+        if match:
+            return question[:match.start()] + " " + question[match.end():], value
+    return question, None
+
+def _words(question: str) -> Set[str]:
+    return set(re.findall(r"[a-z]+", question))
+
+# --- Templates -------------------------------------------------------------------
+
+class Template:
+    """
+    A vetted question shape. `required` is a list of alternative word sets (one must be
+    fully present); after slots are taken out, every remaining word must be a stopword
+    or in `allowed`, otherwise the question carries a constraint we can't honour and
+    it falls through to the agent.
+    """
+    def __init__(self, name: str, required: List[Set[str]], allowed: Set[str], slots: List[str],
+                 build: Callable, needs_date: bool = False):
+        self.name = name
+        self.required = required
+        self.allowed = allowed
+        self.slots = slots
+        self.build = build
+        self.needs_date = needs_date
+
+    def match(self, words: Set[str], slots: dict) -> bool:
+        if self.needs_date and slots.get("date") is None:
+            return False
+        for slot, value in slots.items():
+            if value is not None and slot not in self.slots:
+                return False
+        if not any(req <= words for req in self.required):
+            return False
+        return words <= self.allowed | STOPWORDS
+
+def _filters(slots: dict, date_column="o.order_date"):
+    clauses, params = [], {}
+    if slots.get("date"):
+        start, end, _ = slots["date"]
+        clauses.append(f"{date_column} >= :start AND {date_column} < :end")
+        params.update(start=start, end=end)
+    if slots.get("category"):
+        clauses.append("p.category = :category")
+        params["category"] = slots["category"]
+    if slots.get("city"):
+        clauses.append("c.city = :city")
+        params["city"] = slots["city"]
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+def _scope(slots: dict) -> str:
+    parts = []
+    if slots.get("category"):
+        parts.append(f"in {slots['category']}")
+    if slots.get("city"):
+        parts.append(f"from {slots['city']}")
+    parts.append(f"for {slots['date'][2]}" if slots.get("date") else "(all time)")
+    return " ".join(parts)
+
+def _table(headers: List[str], rows: List[list]) -> str:
+    lines = ["| " + " | ".join(headers) + " |", "|" + "|".join("---" for _ in headers) + "|"]
+    lines += ["| " + " | ".join(str(v) for v in row) + " |" for row in rows]
+    return "\n".join(lines)
+
+def _best_selling(slots, words):
+    by_revenue = "revenue" in words
+    where, params = _filters(slots)
+    params["n"] = slots.get("n") or DEFAULT_TOP_N
+    sql = f"""
+        SELECT p.product_name, p.category, SUM(o.quantity) AS units_sold, COALESCE(SUM(o.total_amount), 0) AS revenue
+        FROM nexora_sales.orders o
+        JOIN nexora_sales.products p ON p.product_id = o.product_id
+        {where}
+        GROUP BY p.product_name, p.category
+        ORDER BY {"revenue" if by_revenue else "units_sold"} DESC
+        LIMIT :n
+    """
+
+    def render(rows):
+        if not rows:
+            return "No sales records found for this criteria."
+        table = _table(["Product", "Category", "Units Sold", "Revenue"],
+                       [[r[0], r[1], f"{int(r[2]):,}", _money(r[3])] for r in rows])
+        top = max(rows, key=lambda r: float(r[3] or 0))
+        return (f"**Top {len(rows)} best-selling products {_scope(slots)}** "
+                f"(by {'revenue' if by_revenue else 'units sold'}):\n\n{table}\n\n"
+                f"Top seller by revenue was **{top[0]}** with **{_money(top[3])}**.")
+    return sql, params, render
+
+def _top_customers(slots, words):
+    where, params = _filters(slots)
+    params["n"] = slots.get("n") or DEFAULT_TOP_N
+    sql = f"""
+        SELECT c.full_name, c.city, COUNT(*) AS orders, COALESCE(SUM(o.total_amount), 0) AS spend
+        FROM nexora_sales.orders o
+        JOIN nexora_sales.customers c ON c.customer_id = o.customer_id
+        {where}
+        GROUP BY c.customer_id, c.full_name, c.city
+        ORDER BY spend DESC
+        LIMIT :n
+    """
+
+    def render(rows):
+        if not rows:
+            return "No sales records found for this criteria."
+        table = _table(["Customer", "City", "Orders", "Total Spend"],
+                       [[r[0], r[1], f"{int(r[2]):,}", _money(r[3])] for r in rows])
+        return (f"**Top {len(rows)} customers by spend {_scope(slots)}:**\n\n{table}\n\n"
+                f"**{rows[0][0]}** leads with **{_money(rows[0][3])}** across {int(rows[0][2]):,} orders.")
+    return sql, params, render
+
+def _low_stock(slots, words):
+    params = {"threshold": slots.get("threshold") or DEFAULT_LOW_STOCK, "limit": LIST_ROWS}
+    category = "AND p.category = :category" if slots.get("category") else ""
+    if slots.get("category"):
+        params["category"] = slots["category"]
+    sql = f"""
+        SELECT p.product_name, p.category, p.stock,
+               COUNT(*) OVER () AS total_products,
+               SUM(CASE WHEN p.stock <= 0 THEN 1 ELSE 0 END) OVER () AS out_of_stock
+        FROM nexora_sales.products p
+        WHERE p.stock < :threshold {category}
+        ORDER BY p.stock ASC, p.product_name
+        LIMIT :limit
+    """
+
+    def render(rows):
+        scope = f" in {slots['category']}" if slots.get("category") else ""
+        if not rows:
+            return f"No products{scope} are below {params['threshold']} units of stock."
+        total_products, out_of_stock = int(rows[0][3]), int(rows[0][4] or 0)
+        table = _table(["Product", "Category", "Stock"], [[r[0], r[1], r[2]] for r in rows])
+        note = f" {out_of_stock:,} of them are out of stock." if out_of_stock else ""
+        shown = f" (lowest {len(rows)} shown)" if total_products > len(rows) else ""
+        return (f"**{total_products:,} products{scope} have fewer than {params['threshold']} units in stock**{shown}:\n\n"
+                f"{table}\n\nLowest stock: **{rows[0][0]}** ({rows[0][2]} units).{note}")
+    return sql, params, render
+
+def _revenue_summary(slots, words):
+    where, params = _filters(slots)
+    joins = ""
+    if slots.get("category"):
+        joins += " JOIN nexora_sales.products p ON p.product_id = o.product_id"
+    if slots.get("city"):
+        joins += " JOIN nexora_sales.customers c ON c.customer_id = o.customer_id"
+    sql = f"""
+        SELECT COUNT(*) AS orders, COALESCE(SUM(o.total_amount), 0) AS revenue, COALESCE(SUM(o.quantity), 0) AS units
+        FROM nexora_sales.orders o{joins}
+        {where}
+    """
+
+    def render(rows):
+        orders, revenue, units = rows[0] if rows else (0, 0, 0)
+        if not orders:
+            return f"No sales records found {_scope(slots)}."
+        average = float(revenue) / orders
+        return (f"**Sales {_scope(slots)}:**\n\n"
+                f"| Metric | Value |\n|---|---|\n"
+                f"| Revenue | {_money(revenue)} |\n| Orders | {int(orders):,} |\n"
+                f"| Units Sold | {int(units):,} |\n| Average Order Value | {_money(average)} |")
+    return sql, params, render
+
+def _sales_list(slots, words):
+    where, params = _filters(slots)
+    params["limit"] = LIST_ROWS
+    sql = f"""
+        SELECT c.full_name, p.product_name, o.quantity, o.total_amount, o.order_date,
+               COUNT(*) OVER () AS total_orders, SUM(o.total_amount) OVER () AS total_revenue
+        FROM nexora_sales.orders o
+        JOIN nexora_sales.products p ON p.product_id = o.product_id
+        JOIN nexora_sales.customers c ON c.customer_id = o.customer_id
+        {where}
+        ORDER BY o.order_date DESC
+        LIMIT :limit
+    """
+
+    def render(rows):
+        if not rows:
+            return f"No sales records found {_scope(slots)}."
+        total_orders, total_revenue = rows[0][5], rows[0][6]
+        table = _table(["Customer", "Product", "Qty", "Amount"],
+                       [[r[0], r[1], r[2], _money(r[3])] for r in rows])
+        shown = f" (latest {len(rows)} shown)" if total_orders > len(rows) else ""
+        return (f"**Sales {_scope(slots)}: {int(total_orders):,} orders worth {_money(total_revenue)}**{shown}\n\n"
+                f"{table}")
+    return sql, params, render
+
+TEMPLATES = [
+    Template("low_stock", [{"low", "stock"}, {"stock", "below"}, {"stock", "under"}, {"stock", "less"}, {"out", "stock"}],
+             {"low", "stock", "products", "product", "items", "item", "running", "out", "of", "level", "levels",
+              "inventory", "below", "under", "less", "than", "fewer", "units", "quantity"},
+             ["category", "threshold"], _low_stock),
+    Template("best_selling", [{"best", "selling"}, {"best", "sellers"}, {"top", "products"}, {"most", "sold"},
+                              {"top", "selling"}, {"popular", "products"}],
+             {"best", "selling", "seller", "sellers", "top", "products", "product", "items", "most", "sold",
+              "popular", "quantity", "revenue", "units"},
+             ["n", "date", "category"], _best_selling),
+    Template("top_customers", [{"top", "customers"}, {"best", "customers"}, {"biggest", "customers"},
+                               {"highest", "spending", "customers"}],
+             {"top", "best", "biggest", "customers", "customer", "spend", "spending", "spent", "revenue",
+              "purchases", "value", "highest", "buyers"},
+             ["n", "date", "city"], _top_customers),
+    Template("revenue_summary", [{"revenue"}, {"total", "sales"}, {"how", "many", "orders"}, {"how", "much", "sales"},
+                                 {"sales", "summary"}],
+             {"total", "revenue", "sales", "how", "much", "many", "orders", "order", "count", "number",
+              "made", "generate", "generated", "earn", "earned", "summary", "overall", "placed"},
+             ["date", "category", "city"], _revenue_summary),
+    Template("sales_list", [{"sales"}, {"orders"}],
+             {"sales", "orders", "sale", "order", "placed", "made"},
+             ["date", "category", "city"], _sales_list, needs_date=True),
+]
+
+def _normalize(question: str) -> str:
+    q = question.lower().replace("’", "'")
+    q = re.sub(r"[^a-z0-9' ]+", " ", q)
+    return re.sub(r"\s+", " ", q).strip()
+
+def match(question: str):
+    """Returns (template, slots, remaining words) for a vetted shape, or None."""
+    q = _normalize(question)
+    slots = {}
+    q, slots["date"] = extract_date_range(q)
+    q, slots["n"] = extract_top_n(q)
+    q, slots["threshold"] = extract_threshold(q)
+    q, slots["category"] = extract_value(q, "SELECT DISTINCT category FROM nexora_sales.products")
+    q, slots["city"] = extract_value(q, "SELECT DISTINCT city FROM nexora_sales.customers")
+    words = _words(q)
+    for template in TEMPLATES:
+        if template.match(words, slots):
+            return template, slots, words
+    return None
+
+def _execute(sql: str, params: dict):
+    """Returns (column names, rows)."""
+    engine = get_engine()
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}"))
+        result = conn.execute(text(sql), params)
+        columns, rows = list(result.keys()), result.fetchall()
+    tracing.record_sql(sql.strip(), time.perf_counter() - start, len(rows))
+    return columns, rows
+
+def _inline(sql: str, params: dict) -> str:
+    """The SQL with its parameters as literals: the result registry (and export) re-runs plain SQL."""
+    statement = text(sql).bindparams(**params)
+    compiled = statement.compile(dialect=get_engine().dialect, compile_kwargs={"literal_binds": True})
+    return str(compiled).strip()
+
+def _result_table(sql: str, params: dict, columns, rows) -> ResultTable:
+    executed = _inline(sql, params)
+    result_id = register_result(executed, columns, len(rows))
+    return build_result_table(executed, columns, rows, result_id=result_id)
+
+def answer(question: str) -> Optional[TemplateAnswer]:
+    """
+    Answers a recurring question shape with vetted parameterized SQL and a templated
+    reply (no LLM call). Returns None to let the agent handle the question.
+    """
+    if not TEMPLATES_ENABLED:
+        return None
+    try:
+        matched = match(question)
+        if matched is None:
+            return None
+        template, slots, words = matched
+        sql, params, render = template.build(slots, words)
+        columns, rows = _execute(sql, params)
+        return TemplateAnswer(template.name, render(rows), sql, params, _result_table(sql, params, columns, rows))
+    except Exception as e:
+        # Any failure here just means the agent answers instead
+        logger.error(f"SQL template failed, falling back to the agent: {e}")
+        return None
@@ -0,0 +1,210 @@
+import os
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from backend.cache import LRUCache
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+# Finished (and in-flight) traces kept for GET /internal/traces/{request_id}
+trace_store = LRUCache(
+    maxsize=int(os.getenv("NEXORA_TRACE_STORE_SIZE", "500")),
+    ttl=float(os.getenv("NEXORA_TRACE_STORE_TTL", "3600"))
+)
+# Statements are stored in traces up to this length
+SQL_TRACE_CHARS = 2000
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("nexora_trace", default=None)
+
+class RequestTrace:
+    """Everything recorded for one HTTP request: LLM calls, SQL statements, rejections, cache lookups."""
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.status = None
+        self.events = []
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, **data):
+        data["kind"] = kind
+        data["at"] = round(time.perf_counter() - self._start, 6)
+        with self._lock:
+            self.events.append(data)
+
+    def finish(self, status: Optional[int] = None):
+        if status is not None:
+            self.status = status
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            events = list(self.events)
+        llm = [e for e in events if e["kind"] == "llm"]
+        sql = [e for e in events if e["kind"] == "sql"]
+        llm_seconds = sum(e.get("seconds", 0) for e in llm)
+        sql_seconds = sum(e.get("seconds", 0) for e in sql)
+        duration = self.duration if self.duration is not None else time.perf_counter() - self._start
+        return {
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished": self.duration is not None,
+            "summary": {
+                "total_seconds": round(duration, 6),
+                "llm_calls": len(llm),
+                "llm_seconds": round(llm_seconds, 6),
+                "tokens_in": sum(e.get("tokens_in") or 0 for e in llm),
+                "tokens_out": sum(e.get("tokens_out") or 0 for e in llm),
+                "sql_statements": len(sql),
+                "sql_seconds": round(sql_seconds, 6),
+                # Time not spent waiting on the model or the database
+                "other_seconds": round(max(duration - llm_seconds - sql_seconds, 0.0), 6),
+                "guard_rejections": sum(1 for e in events if e["kind"] == "guard_rejection"),
+                "cache_hits": sum(1 for e in events if e["kind"] == "cache" and e["hit"]),
+            },
+            "events": events,
+        }
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+def get_trace(request_id: str) -> Optional[dict]:
+    trace = trace_store.get(request_id)
+    return trace.to_dict() if trace is not None else None
+
+# --- Recorders (safe to call with no active trace; metrics are always updated) ---
+
+def record_sql(sql: str, seconds: float, rows: Optional[int], outcome: str = "ok"):
+    metrics.sql_queries.inc(outcome=outcome)
+    if outcome == "ok":
+        metrics.sql_latency.observe(seconds)
+        if rows is not None:
+            metrics.sql_rows.observe(rows)
+    trace = current_trace()
+    if trace is not None:
+        trace.add("sql", sql=sql[:SQL_TRACE_CHARS], seconds=round(seconds, 6), rows=rows, outcome=outcome)
+
+def record_guard_rejection(sql: str, reason: str, kind: str = "guard"):
+    metrics.guard_rejections.inc(reason=kind)
+    trace = current_trace()
+    if trace is not None:
+        trace.add("guard_rejection", sql=sql[:SQL_TRACE_CHARS], reason=reason, rejected_by=kind)
+
+def record_cache(cache: str, hit: bool):
+    metrics.cache_lookups.inc(cache=cache, result="hit" if hit else "miss")
+    trace = current_trace()
+    if trace is not None:
+        trace.add("cache", cache=cache, hit=hit)
+
+def record_intent(intent: str):
+    metrics.intent_routes.inc(intent=intent)
+    trace = current_trace()
+    if trace is not None:
+        trace.add("intent", intent=intent)
+
+def record_template(template: str):
+    metrics.template_answers.inc(template=template)
+    trace = current_trace()
+    if trace is not None:
+        trace.add("template", template=template)
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback recording each LLM call's latency and token usage on a trace.
+    Pass one per request via config={"callbacks": [TracingCallbackHandler(trace)]}.
+    """
+    run_inline = True  # cheap and thread-safe; don't hop to an executor for it
+
+    def __init__(self, trace: Optional[RequestTrace]):
+        self.trace = trace
+        self._starts: Dict[Any, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        seconds = time.perf_counter() - self._starts.pop(run_id, time.perf_counter())
+        tokens_in, tokens_out = _token_usage(response)
+        metrics.llm_calls.inc(outcome="ok")
+        metrics.llm_latency.observe(seconds)
+        if tokens_in:
+            metrics.llm_tokens.inc(tokens_in, direction="in")
+        if tokens_out:
+            metrics.llm_tokens.inc(tokens_out, direction="out")
+        if self.trace is not None:
+            self.trace.add("llm", seconds=round(seconds, 6), tokens_in=tokens_in, tokens_out=tokens_out)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        seconds = time.perf_counter() - self._starts.pop(run_id, time.perf_counter())
+        metrics.llm_calls.inc(outcome="error")
+        if self.trace is not None:
+            self.trace.add("llm", seconds=round(seconds, 6), error=str(error))
+
+def _token_usage(response):
+    """(prompt tokens, completion tokens) from an LLMResult, from usage_metadata or llm_output."""
+    tokens_in = tokens_out = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                tokens_in += usage.get("input_tokens", 0)
+                tokens_out += usage.get("output_tokens", 0)
+    if not (tokens_in or tokens_out) and response.llm_output:
+        usage = response.llm_output.get("token_usage") or {}
+        tokens_in, tokens_out = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return tokens_in, tokens_out
+
+def agent_callbacks() -> list:
+    """Callbacks to pass to the agent for the current request."""
+    return [TracingCallbackHandler(current_trace())]
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Opens a RequestTrace per request under a server-generated id (a client-supplied
+    X-Request-ID is ignored, so one request can't overwrite another's trace), returns the
+    id in X-Request-ID and records request count/latency by route template.
+    Streaming responses keep adding to their trace until the stream ends.
+    """
+    SKIP_PATHS = ("/metrics", "/health")
+
+    async def dispatch(self, request, call_next):
+        if request.url.path in self.SKIP_PATHS:
+            return await call_next(request)
+
+        request_id = uuid.uuid4().hex
+        trace = RequestTrace(request_id, request.method, request.url.path)
+        trace_store.set(request_id, trace)
+        token = _current_trace.set(trace)
+        status, response = 500, None
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Request-ID"] = request_id
+            return response
+        finally:
+            _current_trace.reset(token)
+            route_path = getattr(request.scope.get("route"), "path", "unmatched")
+            metrics.http_requests.inc(method=request.method, route=route_path, status=str(status))
+            metrics.http_latency.observe(time.perf_counter() - trace._start, route=route_path)
+            trace.status = status
+            # SSE streams finish their trace themselves when the last event is sent
+            streaming = response is not None and response.headers.get("content-type", "").startswith("text/event-stream")
+            if not streaming:
+                trace.finish()
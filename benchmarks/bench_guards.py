@@ -0,0 +1,69 @@
+"""
+Micro-benchmark for backend/guards.py::validate_sql.
+
+Measures the cold path (full parse + checks, verdict cache cleared before every call)
+and the warm path (verdict served from the fingerprint cache) over agent-style queries.
+
+Run from the repo root:
+    python -m benchmarks.bench_guards [--iterations 2000]
+"""
+import argparse
+import time
+
+from backend import guards
+
+QUERIES = [
+    "SELECT COUNT(*) FROM orders",
+    "SELECT c.full_name, SUM(o.total_amount) AS spend FROM orders o JOIN customers c ON o.customer_id = c.customer_id "
+    "GROUP BY c.full_name ORDER BY spend DESC LIMIT 5",
+    "SELECT p.product_name, SUM(o.quantity) AS qty, SUM(o.total_amount) AS revenue FROM nexora_sales.orders o "
+    "JOIN nexora_sales.products p ON o.product_id = p.product_id GROUP BY p.product_name ORDER BY qty DESC LIMIT 10",
+    "WITH daily AS (SELECT DATE(order_date) AS day, SUM(total_amount) AS revenue FROM orders "
+    "WHERE order_date >= CURRENT_DATE - interval '7 days' GROUP BY 1) SELECT day, revenue, "
+    "round(avg(revenue) OVER (ORDER BY day)::numeric, 2) FROM daily ORDER BY day",
+    "SELECT product_name, stock FROM products WHERE stock < 10 ORDER BY stock",
+    "WITH x AS (DELETE FROM orders RETURNING *) SELECT * FROM x",
+    "SELECT pg_sleep(5)",
+]
+
+def _time_per_call(func, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+def _validate(query: str):
+    try:
+        guards.validate_sql(query)
+    except guards.SQLGuardException:
+        pass
+
+def run(iterations: int = 2000) -> dict:
+    """Returns {query_label: {"cold_us": ..., "warm_us": ...}}."""
+    results = {}
+    for i, query in enumerate(QUERIES):
+        def cold():
+            guards._verdict_cache.clear()
+            _validate(query)
+
+        def warm():
+            _validate(query)
+
+        cold_s = _time_per_call(cold, max(1, iterations // 10))
+        _validate(query)  # prime the cache
+        warm_s = _time_per_call(warm, iterations)
+        results[f"q{i}"] = {"cold_us": round(cold_s * 1e6, 2), "warm_us": round(warm_s * 1e6, 2)}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    print(f"{'query':<6} {'cold (us)':>12} {'warm (us)':>12}   sql")
+    for (label, r), query in zip(results.items(), QUERIES):
+        print(f"{label:<6} {r['cold_us']:>12.2f} {r['warm_us']:>12.2f}   {query[:60]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Login throughput benchmark for backend/auth/hashing.py.
+
+Fires concurrent verify_password calls (what /auth/login does per request) against
+the hashing process pool at several worker counts and reports logins/sec.
+
+Run from the repo root:
+    python -m benchmarks.bench_hashing [--logins 200] [--workers 1 4 8]
+"""
+import argparse
+import asyncio
+import time
+
+from backend.auth import hashing
+
+async def _run_logins(stored_hash: str, logins: int) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(hashing.verify_password("secret-password", stored_hash) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    assert all(ok for ok, _ in results)
+    return elapsed
+
+def run(logins: int = 200, workers=(1, 4, 8)) -> dict:
+    """Returns {workers: {"seconds": ..., "logins_per_sec": ...}}."""
+    stored_hash = hashing.pwd_context.hash("secret-password")
+    # The benchmark measures throughput, not fast rejection
+    hashing.HASH_MAX_PENDING = logins
+    results = {}
+    for count in workers:
+        hashing.shutdown()
+        hashing.HASH_WORKERS = count
+        # Warm-up: start the worker processes outside the timed section
+        asyncio.run(_run_logins(stored_hash, count))
+        elapsed = asyncio.run(_run_logins(stored_hash, logins))
+        results[count] = {"seconds": round(elapsed, 3), "logins_per_sec": round(logins / elapsed, 1)}
+    hashing.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    results = run(args.logins, args.workers)
+    print(f"{'workers':<8} {'seconds':>10} {'logins/sec':>12}")
+    for count, r in results.items():
+        print(f"{count:<8} {r['seconds']:>10.3f} {r['logins_per_sec']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Offline fixtures for the benchmark suite: a seeded SQLite database laid out like the
+Neon one (nexora_sales / nexora_auth / nexora_rollup attached as schemas) and a scripted
+chat model, so agent code paths run without network access or API keys.
+
+Import this module before any `backend` module: it points the backend's environment
+(cache directory, API key) at throwaway values.
+"""
+import os
+import random
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+WORKDIR = tempfile.mkdtemp(prefix="nexora-bench-")
+os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+os.environ.setdefault("SECRET_KEY", "offline-benchmark-secret")
+os.environ["NEXORA_CACHE_DIR"] = os.path.join(WORKDIR, "cache")
+
+from sqlalchemy import create_engine, event
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+SCHEMAS = ("nexora_sales", "nexora_auth", "nexora_rollup")
+
+def make_engine(customers: int = 500, products: int = 50, orders: int = 20000, seed: int = 7):
+    """SQLite engine with the three schemas attached and synthetic sales data."""
+    engine = create_engine(f"sqlite:///{WORKDIR}/main.db", pool_size=5, max_overflow=10)
+
+    @event.listens_for(engine, "connect")
+    def attach_schemas(dbapi_connection, connection_record):
+        for schema in SCHEMAS:
+            dbapi_connection.execute(f"ATTACH DATABASE '{WORKDIR}/{schema}.db' AS {schema}")
+
+    rng = random.Random(seed)
+    now = datetime.now()
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE nexora_sales.customers (customer_id INTEGER PRIMARY KEY, full_name TEXT, email TEXT, "
+            "mobile_number TEXT, city TEXT, state TEXT)")
+        conn.exec_driver_sql(
+            "CREATE TABLE nexora_sales.products (product_id INTEGER PRIMARY KEY, product_name TEXT, category TEXT, "
+            "price NUMERIC, stock INTEGER)")
+        conn.exec_driver_sql(
+            "CREATE TABLE nexora_sales.orders (order_id INTEGER PRIMARY KEY, customer_id INTEGER, product_id INTEGER, "
+            "quantity INTEGER, total_amount NUMERIC, payment_mode TEXT, order_status TEXT, order_date TIMESTAMP)")
+        # The auth models use Postgres UUID columns; CHAR(32) is their SQLite storage form
+        conn.exec_driver_sql(
+            "CREATE TABLE nexora_auth.users (id CHAR(32) PRIMARY KEY, full_name TEXT NOT NULL, "
+            "email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL, created_at TIMESTAMP)")
+        conn.exec_driver_sql(
+            "CREATE TABLE nexora_auth.chat_history (id CHAR(32) PRIMARY KEY, user_id CHAR(32) NOT NULL, "
+            "role TEXT NOT NULL, content TEXT NOT NULL, timestamp TIMESTAMP)")
+
+        cities = ["Ahmedabad", "Surat", "Mumbai", "Pune", "Delhi", "Jaipur"]
+        conn.exec_driver_sql("INSERT INTO nexora_sales.customers VALUES (?, ?, ?, ?, ?, ?)", [
+            (i, f"Customer {i}", f"c{i}@example.com", f"9{i:09d}", rng.choice(cities), "State")
+            for i in range(1, customers + 1)
+        ])
+        categories = ["Electronics", "Grocery", "Fashion", "Home"]
+        prices = {i: rng.randint(100, 5000) for i in range(1, products + 1)}
+        conn.exec_driver_sql("INSERT INTO nexora_sales.products VALUES (?, ?, ?, ?, ?)", [
+            (i, f"Product {i}", rng.choice(categories), prices[i], rng.randint(0, 500))
+            for i in range(1, products + 1)
+        ])
+        rows = []
+        for i in range(1, orders + 1):
+            product_id, quantity = rng.randint(1, products), rng.randint(1, 5)
+            order_date = now - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86399))
+            rows.append((i, rng.randint(1, customers), product_id, quantity, prices[product_id] * quantity,
+                         rng.choice(["UPI", "Card", "Cash"]), "Delivered", order_date.strftime("%Y-%m-%d %H:%M:%S")))
+        conn.exec_driver_sql("INSERT INTO nexora_sales.orders VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return engine
+
+def seed_user(engine, messages: int = 2000) -> str:
+    """Creates a user with `messages` chat history rows; returns the user id."""
+    user_id = uuid.uuid4()
+    start = datetime.utcnow() - timedelta(days=30)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO nexora_auth.users VALUES (?, ?, ?, ?, ?)",
+            (user_id.hex, "Bench User", f"{user_id.hex}@example.com", "x", start.isoformat(sep=" ")))
+        conn.exec_driver_sql("INSERT INTO nexora_auth.chat_history VALUES (?, ?, ?, ?, ?)", [
+            (uuid.uuid4().hex, user_id.hex, "user" if i % 2 == 0 else "assistant", f"message {i}",
+             (start + timedelta(seconds=30 * i)).strftime("%Y-%m-%d %H:%M:%S.%f"))
+            for i in range(messages)
+        ])
+    return str(user_id)
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Offline stand-in for ChatOpenAI. Stateless, so one instance serves every run:
+    it issues `sql` through sql_db_query on the first turn and answers once the
+    tool result is in the conversation.
+    """
+    sql: str = "SELECT COUNT(*) FROM orders"
+    answer: str = "There are the requested orders."
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if isinstance(messages[-1], ToolMessage):
+            message = AIMessage(content=self.answer)
+        else:
+            message = AIMessage(content="", tool_calls=[{
+                "name": "sql_db_query", "args": {"query": self.sql}, "id": f"call_{uuid.uuid4().hex[:8]}"
+            }])
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+def install(engine, chat_model=None):
+    """Points the backend at `engine` and the scripted model (no network from here on)."""
+    import backend.db
+    import backend.agent
+
+    backend.db._engine = engine
+    backend.db._session_registry = None
+    model = chat_model or ScriptedChatModel()
+    backend.agent.ChatOpenAI = lambda **kwargs: model
+    return model
@@ -0,0 +1,207 @@
+"""
+Offline component benchmark suite with baseline regression tracking.
+
+Runs entirely locally: a seeded SQLite database stands in for Neon and a scripted
+chat model stands in for OpenAI (see benchmarks/fixtures.py). Each case is timed over
+several repeats; the median is compared against a JSON baseline and cases slower than
+the baseline by more than --threshold are flagged (exit code 1).
+
+Run from the repo root:
+    python -m benchmarks.suite                      # compare against the baseline
+    python -m benchmarks.suite --update-baseline    # record a new baseline
+    python -m benchmarks.suite --only chat_roundtrip history_fetch --repeat 50
+
+Baselines are machine-specific: record one on the machine you compare on.
+"""
+import io
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import statistics
+import contextlib
+from datetime import datetime
+
+from benchmarks import fixtures
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "baseline.json")
+DEFAULT_THRESHOLD = 0.20
+# Differences below this many milliseconds are treated as noise
+NOISE_FLOOR_MS = 0.05
+
+def _build_cases(engine, user_id, token):
+    """Returns {name: (callable, default repeats)}; setup that shouldn't be timed happens here."""
+    from fastapi.testclient import TestClient
+
+    import backend.agent as agent
+    from backend import guards, rollups, schema_cache, sql_templates
+    from backend.db import get_db_connection, get_session
+    from backend.auth.service import AuthService
+    from backend.main import app
+    from benchmarks.bench_guards import QUERIES
+
+    db = get_db_connection()
+    client = TestClient(app)
+    client.__enter__()  # runs the startup hooks once (agent warm-up, rollup tables, indexes)
+    headers = {"Authorization": f"Bearer {token}"}
+    # "How many orders?" matches a canned SQL template; the chat cases time the agent path
+    sql_templates.TEMPLATES_ENABLED = False
+
+    def validate_sql_cold():
+        guards._verdict_cache.clear()
+        for query in QUERIES:
+            try:
+                guards.validate_sql(query)
+            except guards.SQLGuardException:
+                pass
+
+    def validate_sql_warm():
+        for query in QUERIES:
+            try:
+                guards.validate_sql(query)
+            except guards.SQLGuardException:
+                pass
+
+    def agent_construction():
+        agent._agent_executor = None
+        agent.get_agent_executor()
+
+    def schema_render():
+        schema_cache.get_schema_snapshot(db, force=True)
+
+    def schema_cached():
+        db.get_table_info()
+
+    def dashboard_stats():
+        rollups._stats_cache.clear()
+        rollups.get_dashboard_stats()
+
+    def history_fetch():
+        session = get_session().session_factory()
+        try:
+            AuthService(session).get_chat_history(user_id, limit=50)
+        finally:
+            session.close()
+
+    def chat_roundtrip():
+        # Uncached path: model -> sql_db_query -> guarded query -> answer
+        agent.answer_cache.clear()
+        agent.result_cache.clear()
+        response = client.post("/agent/chat", json={"input": "How many orders?", "history": []}, headers=headers)
+        response.raise_for_status()
+
+    def chat_cached():
+        response = client.post("/agent/chat", json={"input": "How many orders?", "history": []}, headers=headers)
+        response.raise_for_status()
+
+    return {
+        "validate_sql_cold": (validate_sql_cold, 50),
+        "validate_sql_warm": (validate_sql_warm, 500),
+        "agent_construction": (agent_construction, 10),
+        "schema_render": (schema_render, 10),
+        "schema_cached": (schema_cached, 200),
+        "dashboard_stats": (dashboard_stats, 50),
+        "history_fetch": (history_fetch, 100),
+        "chat_roundtrip": (chat_roundtrip, 30),
+        "chat_cached": (chat_cached, 100),
+    }
+
+def _time_case(func, repeats: int, warmup: int = 2) -> dict:
+    # The agent is built with verbose=True; keep its chain printout out of the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            func()
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+        "repeats": repeats,
+    }
+
+def run(only=None, repeat=None) -> dict:
+    logging.getLogger("backend").setLevel(logging.ERROR)
+    engine = fixtures.make_engine()
+    fixtures.install(engine)
+    user_id = fixtures.seed_user(engine)
+
+    from backend.auth.tokens import create_access_token
+    cases = _build_cases(engine, user_id, create_access_token(user_id))
+
+    results = {}
+    for name, (func, repeats) in cases.items():
+        if only and name not in only:
+            continue
+        results[name] = _time_case(func, repeat or repeats)
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> dict:
+    """Returns {case: {"baseline_ms", "change", "regression"}} for cases present in the baseline."""
+    report = {}
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        change = (result["median_ms"] - base["median_ms"]) / base["median_ms"] if base["median_ms"] else 0.0
+        regression = change > threshold and result["median_ms"] - base["median_ms"] > NOISE_FLOOR_MS
+        report[name] = {"baseline_ms": base["median_ms"], "change": round(change, 4), "regression": regression}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON to compare against / update")
+    parser.add_argument("--update-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--repeat", type=int, help="override the per-case repeat count")
+    parser.add_argument("--only", nargs="+", help="run only these cases")
+    parser.add_argument("--output", help="also write the results JSON here")
+    args = parser.parse_args()
+
+    results = run(args.only, args.repeat)
+    payload = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "results": results,
+    }
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report = compare(results, baseline, args.threshold) if baseline else {}
+
+    print(f"{'case':<20} {'median ms':>11} {'p95 ms':>11} {'baseline':>11} {'change':>9}")
+    for name, r in results.items():
+        c = report.get(name)
+        base = f"{c['baseline_ms']:>11.3f}" if c else f"{'-':>11}"
+        change = f"{c['change']:>+8.1%}" if c else f"{'-':>8}"
+        flag = "  REGRESSION" if c and c["regression"] else ""
+        print(f"{name:<20} {r['median_ms']:>11.3f} {r['p95_ms']:>11.3f} {base} {change}{flag}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(payload, f, indent=2)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(payload, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    elif baseline is None:
+        print(f"No baseline at {args.baseline}; record one with --update-baseline.")
+
+    regressions = [name for name, c in report.items() if c["regression"]]
+    if regressions:
+        print(f"Regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
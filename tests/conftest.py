@@ -0,0 +1,10 @@
+import pytest
+
+from benchmarks import fixtures
+
+@pytest.fixture(scope="session")
+def offline_engine():
+    """The benchmark SQLite database; its files live in one per-process directory, so it is built once."""
+    engine = fixtures.make_engine(customers=50, products=120, orders=2000)
+    fixtures.install(engine)
+    return engine
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from passlib.hash import pbkdf2_sha256
+from sqlalchemy import event
+
+from backend.auth import hashing
+from backend.auth.service import AuthService
+from backend.db import get_session
+from benchmarks import fixtures
+
+def test_login_rehash_does_no_database_io_on_the_event_loop(offline_engine):
+    engine = offline_engine
+    fixtures.install(engine)
+    user_id = fixtures.seed_user(engine, messages=1)
+    email = f"{user_id.replace('-', '')}@example.com"
+    old_hash = pbkdf2_sha256.using(rounds=1000).hash("secret")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE nexora_auth.users SET password_hash = ? WHERE email = ?", (old_hash, email))
+
+    loop_thread, on_loop = threading.current_thread(), []
+    def record(conn, cursor, statement, *args):
+        if threading.current_thread() is loop_thread:
+            on_loop.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    session = get_session().session_factory()
+    try:
+        user, error = asyncio.run(AuthService(session).login(email, "secret"))
+        assert error is None
+        assert (user.id, user.full_name, user.email) and user.password_hash != old_hash
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+        session.close()
+        hashing.shutdown()
+    assert on_loop == []
@@ -0,0 +1,78 @@
+import pytest
+
+from backend.guards import validate_sql, normalize_sql, check_identifiers, SQLGuardException
+
+@pytest.mark.parametrize("query", [
+    "SELECT \"set_config\"('statement_timeout', '0', false)",
+    "SELECT \"lo_import\"('/etc/passwd')",
+    "SELECT \"pg_sleep\"(5)",
+    "SELECT \"PG_SLEEP\"(5)",
+    "SELECT \"pg_catalog\".\"now\"()",
+    "SELECT order_id FROM orders WHERE customer_id IN (\"dblink\"('x', 'y'))",
+    "SELECT * FROM \"pg_user\"",
+])
+def test_quoted_function_calls_are_checked(query):
+    with pytest.raises(SQLGuardException):
+        validate_sql(query)
+
+@pytest.mark.parametrize("query", [
+    "SELECT \"sum\"(total_amount) FROM orders",
+    "SELECT \"full_name\" FROM customers",
+    "SELECT COUNT(*) FILTER (WHERE payment_mode = 'UPI') FROM orders",
+    "SELECT o.product_id FROM orders o JOIN products p USING (product_id)",
+])
+def test_allowed_queries_pass(query):
+    assert validate_sql(query)
+
+@pytest.mark.parametrize("query", [
+    "SELECT total_amount::numeric(10,2) FROM orders",
+    "SELECT CAST(total_amount AS DECIMAL(12,2)) FROM orders",
+    "SELECT full_name::varchar(20) FROM customers",
+    "SELECT ROUND(SUM(total_amount)::numeric(12,2),2) FROM orders",
+    "SELECT full_name::character varying(20) FROM customers",
+    "SELECT x FROM (VALUES (1), (2)) v(x)",
+    "SELECT n FROM generate_series(1, 3) AS g(n)",
+])
+def test_type_modifiers_and_alias_column_lists_are_not_calls(query):
+    assert validate_sql(query)
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM orders FOR SHARE",
+    "SELECT * FROM orders FOR KEY SHARE",
+    "SELECT * FROM orders FOR NO KEY UPDATE",
+    "SELECT dblink('a')::numeric(10,2)",
+    "SELECT total_amount::numeric(10, (SELECT 1 FROM other.t)) FROM orders",
+])
+def test_row_locks_and_calls_around_casts_are_rejected(query):
+    with pytest.raises(SQLGuardException):
+        validate_sql(query)
+
+def test_normalize_sql_keeps_numeric_literals():
+    assert normalize_sql("SELECT total_amount/2.0 FROM orders") != normalize_sql("SELECT total_amount/2 FROM orders")
+    assert normalize_sql("select  COUNT(*)\nFROM Orders -- c\n;") == normalize_sql("SELECT count(*) FROM orders")
+
+CATALOG = {
+    "orders": [["order_id", "integer"], ["customer_id", "integer"], ["order_date", "date"],
+               ["total_amount", "numeric"]],
+    "customers": [["customer_id", "integer"], ["full_name", "text"], ["city", "text"]],
+}
+
+@pytest.mark.parametrize("query", [
+    "SELECT EXTRACT(MONTH FROM order_date) AS m, SUM(total_amount) FROM orders GROUP BY m",
+    "SELECT EXTRACT(dow FROM o.order_date) FROM orders o",
+    "SELECT TRIM(BOTH ' ' FROM city) FROM customers",
+    "SELECT true AS flag FROM orders ORDER BY flag",
+    "SELECT 'x' label, order_id FROM orders",
+    "SELECT COALESCE((SELECT MAX(order_id) FROM orders), 0) AS last_id FROM customers",
+])
+def test_check_identifiers_accepts_valid_queries(query):
+    assert check_identifiers(query, CATALOG)
+
+@pytest.mark.parametrize("query, unknown", [
+    ("SELECT EXTRACT(MONTH FROM order_day) FROM orders", "order_day"),
+    ("SELECT true AS flag, region FROM orders", "region"),
+    ("SELECT COALESCE((SELECT MAX(order_id) FROM shipments), 0) FROM orders", "shipments"),
+])
+def test_check_identifiers_rejects_unknown_names(query, unknown):
+    with pytest.raises(SQLGuardException, match=unknown):
+        check_identifiers(query, CATALOG)
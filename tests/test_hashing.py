@@ -0,0 +1,20 @@
+import asyncio
+import threading
+
+from backend.auth import hashing
+
+def test_shutdown_with_jobs_in_flight():
+    async def submit():
+        return [asyncio.ensure_future(hashing.hash_password(f"password-{i}")) for i in range(6)]
+
+    loop = asyncio.new_event_loop()
+    try:
+        jobs = loop.run_until_complete(submit())
+        done = threading.Event()
+        thread = threading.Thread(target=lambda: (hashing.shutdown(), done.set()), daemon=True)
+        thread.start()
+        assert done.wait(timeout=30), "shutdown() deadlocked with hash jobs in flight"
+        loop.run_until_complete(asyncio.gather(*jobs, return_exceptions=True))
+    finally:
+        loop.close()
+    assert hashing.stats()["pending"] == 0
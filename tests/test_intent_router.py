@@ -0,0 +1,27 @@
+import pytest
+
+from backend.intent_router import classify, route
+
+@pytest.mark.parametrize("message", ["hi", "Hello there!", "thanks a lot", "ok", "good morning, nexora", "bye!!"])
+def test_greetings(message):
+    assert classify(message) == "greeting"
+
+@pytest.mark.parametrize("message", ["great, now show for Pune", "ok, do that", "ok show more", "hey show me pune"])
+def test_messages_opening_with_a_greeting_go_to_the_agent(message):
+    assert classify(message) == "data"
+
+def test_follow_ups_skip_routing():
+    history = [{"role": "user", "content": "Revenue this month?"}, {"role": "assistant", "content": "Rs 12,000"}]
+    assert route("thanks", history) is None
+    assert route("thanks").intent == "greeting"
+
+@pytest.mark.parametrize("message", [
+    "show me music systems", "list all cricket bats", "how many football jerseys do we have left",
+    "any game consoles left?", "show code readers",
+])
+def test_product_catalog_questions_go_to_the_agent(message):
+    assert classify(message) == "data"
+
+@pytest.mark.parametrize("message", ["write a poem about the sea", "tell me a joke", "what's the weather in Pune"])
+def test_clear_out_of_domain_requests(message):
+    assert classify(message) == "out_of_domain"
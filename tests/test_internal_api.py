@@ -0,0 +1,26 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.api import internal
+from backend.auth import tokens
+from backend.tracing import TracingMiddleware
+
+app = FastAPI()
+app.add_middleware(TracingMiddleware)
+app.include_router(internal.router, prefix="/internal")
+client = TestClient(app)
+
+def _headers(email):
+    return {"Authorization": f"Bearer {tokens.create_access_token('42', email)}"}
+
+def test_internal_endpoints_require_an_admin(monkeypatch):
+    monkeypatch.setattr(tokens, "ADMIN_EMAILS", {"ops@example.com"})
+    assert client.get("/internal/messages").status_code == 401
+    assert client.get("/internal/messages", headers=_headers("user@example.com")).status_code == 403
+    assert client.get("/internal/messages", headers=_headers("OPS@example.com")).status_code == 200
+
+def test_trace_ids_are_generated_by_the_server(monkeypatch):
+    monkeypatch.setattr(tokens, "ADMIN_EMAILS", {"ops@example.com"})
+    response = client.get("/internal/traces/x", headers={**_headers("ops@example.com"), "X-Request-ID": "victim"})
+    assert response.headers["X-Request-ID"] != "victim"
+    assert client.get("/internal/traces/victim", headers=_headers("ops@example.com")).status_code == 404
@@ -0,0 +1,53 @@
+import uuid
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from backend.auth.message_buffer import MessageBuffer, check_message
+
+class FakeDatabase:
+    """Stands in for MessageBuffer._write: rejects rows whose content is "bad", or everything while down."""
+    def __init__(self):
+        self.rows = []
+        self.down = False
+
+    def write(self, rows):
+        if self.down:
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        if any(row["content"] == "bad" for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("foreign key violation"))
+        self.rows.extend(rows)
+
+def make_buffer():
+    buffer, db = MessageBuffer(flush_interval=1.0, max_backoff=8.0), FakeDatabase()
+    buffer._write = db.write
+    buffer._thread = object()  # queue only; the test flushes explicitly
+    return buffer, db
+
+def test_bad_row_is_dropped_alone():
+    buffer, db = make_buffer()
+    buffer.add(uuid.uuid4(), [("user", "q1"), ("assistant", "a1")])
+    buffer.add(uuid.uuid4(), [("user", "bad")])
+    buffer.add(uuid.uuid4(), [("user", "q2")])
+    assert buffer.flush()
+    assert [row["content"] for row in db.rows] == ["q1", "a1", "q2"]
+    assert buffer.stats()["dropped"] == 1 and buffer.pending == 0
+
+def test_database_outage_keeps_rows_and_backs_off():
+    buffer, db = make_buffer()
+    buffer.add(uuid.uuid4(), [("user", f"q{i}") for i in range(3)])
+    db.down = True
+    for expected in (2.0, 4.0, 8.0, 8.0, 8.0, 8.0, 8.0):
+        assert not buffer.flush()
+        assert buffer.backoff == expected
+    assert buffer.pending == 3 and buffer.stats()["dropped"] == 0
+
+    db.down = False
+    buffer.drain()
+    assert [row["content"] for row in db.rows] == ["q0", "q1", "q2"]
+    assert buffer.backoff == 1.0
+
+@pytest.mark.parametrize("content", ["nul \x00 byte", "x" * 200_000])
+def test_check_message_rejects_unstorable_content(content):
+    with pytest.raises(ValueError):
+        check_message("user", content)
@@ -0,0 +1,29 @@
+import re
+
+import pytest
+
+from backend import sql_templates
+from backend.guards import validate_sql
+from backend.query_runner import result_registry
+from benchmarks import fixtures
+
+@pytest.fixture(scope="module", autouse=True)
+def database(offline_engine):
+    fixtures.install(offline_engine)
+
+def test_low_stock_reports_the_true_count_beyond_the_list_cap():
+    answer = sql_templates.answer("products with stock below 400")
+    total = int(answer.result.data[answer.result.columns.index("total_products")][0])
+    assert total > sql_templates.LIST_ROWS
+    assert f"**{total:,} products have fewer than 400 units in stock** (lowest {sql_templates.LIST_ROWS} shown)" in answer.output
+
+@pytest.mark.parametrize("question", [
+    "low stock products", "top 3 customers this year", "best selling products last 30 days",
+    "total revenue this month", "sales last 7 days",
+])
+def test_templated_answers_carry_an_exportable_result(question):
+    answer = sql_templates.answer(question)
+    assert answer is not None and answer.result is not None
+    entry = result_registry.get(answer.result.result_id)
+    assert entry["sql"] == answer.result.sql and not re.search(r"(?<!:):[a-z_]", entry["sql"])
+    assert validate_sql(entry["sql"])
@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+from backend.auth.tokens import (
+    create_access_token, decode_access_token, InvalidToken, _b64encode, _sign,
+)
+
+def _signed(header, claims) -> str:
+    signing_input = f"{_b64encode(json.dumps(header).encode())}.{_b64encode(json.dumps(claims).encode())}"
+    return f"{signing_input}.{_b64encode(_sign(signing_input.encode()))}"
+
+def test_round_trip():
+    assert decode_access_token(create_access_token("42", "a@example.com"))["sub"] == "42"
+
+@pytest.mark.parametrize("token", [
+    "not-a-token",
+    _signed(["HS256"], {"sub": "42", "exp": 2**40}),
+    _signed({"alg": "HS256"}, ["42"]),
+    _signed({"alg": "HS256"}, "42"),
+])
+def test_malformed_tokens_raise_invalid_token(token):
+    with pytest.raises(InvalidToken):
+        decode_access_token(token)